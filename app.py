@@ -1,46 +1,178 @@
+import numpy as np
 import streamlit as st
 import pandas as pd
-import altair as alt
-from utils.io import load_data
-from utils.prep import make_tables
-from sections import intro, overview, deepdives, conclusions
-from utils import viz
-import numpy as np
+from utils.index import DateIndex
+from utils.io import data_fingerprint, load_tables
+from utils.prefix import StationPrefixSums
+from utils.downsample import downsample
+from utils import decay, playback, qc, surface
+from utils.spatial import StationIndex, distance_view
+from utils.schema import memory_report
+from sections import intro
+from utils import viz, trace, cache
+# The other sections (and altair / pydeck, imported by the chart builders) are loaded by the
+# narrative step that renders them, so a start on one step does not pay for the others.
 
 st.set_page_config(page_title="Chernobyl Radiation Dashboard", layout="wide")
 
+# Timing spans of this rerun (diagnostics panel at the bottom of the sidebar, JSON lines via TRACE_LOG)
+trace.start_run()
+
 # --- 1️⃣ Data loading and preparation ---
-@st.cache_data(show_spinner=False)
-def get_data():
+@trace.traced("get_data", cached=True)
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_data(fingerprint: str):
+	"""
+	Load the derived tables (e.g. 'clean', 'timeseries') produced by make_tables().
+
+	Tables come from the columnar cache in data/ when it matches the CSV content hash,
+	so only the first start after a data or pipeline change pays for the CSV parse.
+	The result is a LazyTables shared by all sessions (not copied per rerun): each table is
+	loaded or built on first read, so tables no page reads cost nothing. Do not modify them in place.
+	`fingerprint` (see utils.io.data_fingerprint) keys the cache so new data is picked up.
 	"""
-	Load raw CSV and produce derived tables.
+	trace.cache_miss()
+	return load_tables(fingerprint)
 
-	Returns:
-	- df_raw: pandas.DataFrame of original records (with Date parsed)
-	- tables: dict of derived tables (e.g. 'clean', 'timeseries') produced by make_tables()
+@trace.traced("get_date_index", cached=True)
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_date_index(fingerprint: str) -> DateIndex:
+	"""Per-day index over tables['clean'], built once per dataset and shared across sessions."""
+	trace.cache_miss()
+	return DateIndex(get_data(fingerprint)["clean"])
 
-	This wrapper centralizes loading + minimal date parsing and drops rows with invalid dates.
+@trace.traced("get_range_engine", cached=True)
+@st.cache_resource(show_spinner=False, max_entries=3)
+def get_range_engine(fingerprint: str, exclude: int = 0) -> StationPrefixSums:
 	"""
-	# Load raw dataframe and build derived tables
-	df_raw = load_data()
-	tables = make_tables(df_raw)
+	Per-station prefix sums over the day axis: any date-range aggregate is two array lookups.
+	Readings carrying any of the `exclude` QC bits are left out; each filter holds its own dense
+	arrays, so only the unfiltered engine and the last two filters stay resident.
+	"""
+	trace.cache_miss()
+	return StationPrefixSums(get_date_index(fingerprint), exclude=exclude)
+
+@cache.memoized("get_map_data")
+def get_map_data(fingerprint: str, start, end, isotope: str, exclude: int = 0) -> pd.DataFrame:
+	"""prepare_map_data() on the per-station means of a (date range, isotope), memoized."""
+	stations = get_range_engine(fingerprint, exclude).station_frame(start, end)
+	with trace.span("prepare_map_data", rows_in=len(stations)) as s:
+		df_filtered = viz.prepare_map_data(stations, isotope, scale=1000.0 * 5)
+		s.rows_out = len(df_filtered)
+	return df_filtered
 
-	# Ensure the "Date" column is parsed as datetime in each table and in df_raw
-	for tbl in tables.values():
-		if "Date" in tbl.columns:
-			tbl["Date"] = pd.to_datetime(tbl["Date"], format="%y/%m/%d", errors="coerce")
+@cache.memoized("get_map_cells")
+def get_map_cells(fingerprint: str, start, end, isotope: str, zoom: int, exclude: int = 0) -> pd.DataFrame:
+	"""Grid-aggregated map points for a (date range, isotope, zoom bucket), memoized."""
+	return viz.aggregate_cells(get_map_data(fingerprint, start, end, isotope, exclude), viz.cell_size_for_zoom(zoom))
+
+@cache.memoized("get_trend_data")
+def get_trend_data(fingerprint: str, isotopes: tuple, start, end, max_points: int, exclude: int = 0) -> pd.DataFrame:
+	"""
+	Long-format trend series (Date / Isotope / Concentration) for the isotopes over [start, end]
+	(whole period when None), reduced to about max_points per isotope with min/max buckets so peaks survive.
+	With QC bits to `exclude`, the daily means are taken from the filtered prefix sums instead of 'timeseries'.
+	"""
+	if exclude:
+		engine = get_range_engine(fingerprint, exclude)
+		with np.errstate(invalid="ignore", divide="ignore"):
+			daily = np.diff(engine.sums, axis=0).sum(axis=1) / np.diff(engine.counts, axis=0).sum(axis=1)
+		ts = pd.DataFrame(daily, columns=engine.value_cols)
+		ts.insert(0, "Date", pd.to_datetime(engine.index.days))
+	else:
+		ts = get_data(fingerprint)["timeseries"]
+	if start is not None:
+		ts = ts[(ts["Date"] >= pd.Timestamp(start)) & (ts["Date"] < pd.Timestamp(end) + pd.Timedelta(days=1))]
+	df = ts.melt(id_vars="Date", value_vars=list(isotopes), var_name="Isotope", value_name="Concentration")
+	return downsample(df, max_points, method="minmax")
+
+
+@cache.memoized("get_peak")
+def get_peak(fingerprint: str, isotopes: tuple) -> pd.Series:
+	"""Date and concentration of the highest daily mean over all isotopes (NaT / NaN when there is none)."""
+	df_time = get_data(fingerprint)["timeseries"].melt(id_vars="Date", value_vars=list(isotopes),
+	                                                    var_name="Isotope", value_name="Concentration")
+	# Protect idxmax usage if all NaN
+	if df_time["Concentration"].dropna().empty:
+		return pd.Series({"Date": pd.NaT, "Concentration": float("nan")})
+	return df_time.loc[df_time["Concentration"].idxmax()]
+
+@cache.memoized("get_top10")
+def get_top10(fingerprint: str, start, end, exclude: int = 0) -> pd.DataFrame:
+	"""Top 10 stations by total concentration over [start, end] (StationPrefixSums.top)."""
+	return get_range_engine(fingerprint, exclude).top(start, end, n=10)
+
+@cache.memoized("get_decay")
+def get_decay(fingerprint: str, isotopes: tuple):
+	"""
+	Decay analytics on the daily series, computed once per fingerprint:
+	- approx. daily % change across isotopes (decay.approx_daily_decay_pct)
+	- post-peak log-linear fits per isotope (decay.fit_decay)
+	"""
+	timeseries = get_data(fingerprint)["timeseries"]
+	df_time = timeseries.melt(id_vars="Date", value_vars=list(isotopes),
+	                          var_name="Isotope", value_name="Concentration")
+	return decay.approx_daily_decay_pct(df_time), decay.fit_decay(timeseries, isotopes)
 
-	# Drop rows with invalid dates from df_raw
-	df_raw["Date"] = pd.to_datetime(df_raw["Date"], format="%y/%m/%d", errors="coerce")
-	df_raw = df_raw.dropna(subset=["Date"])  
+@cache.memoized("get_station_fits")
+def get_station_fits(fingerprint: str, isotopes: tuple) -> pd.DataFrame:
+	"""Post-peak decay fits per station × isotope on the clean rows (only the Analysis step shows them)."""
+	return decay.fit_decay(get_data(fingerprint)["clean"], isotopes, by=["Location"])
 
-	return df_raw, tables
+@trace.traced("get_station_index", cached=True)
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_station_index(fingerprint: str) -> StationIndex:
+	"""Grid index of the station coordinates with each station's distance from the plant, built once per dataset."""
+	trace.cache_miss()
+	return StationIndex(get_data(fingerprint)["clean"])
+
+@cache.memoized("get_distance_view")
+def get_distance_view(fingerprint: str, start, end, isotope: str, exclude: int = 0) -> pd.DataFrame:
+	"""Readings of a (date range, isotope) with their station's distance from the plant, memoized."""
+	rows = qc.without_flagged(get_date_index(fingerprint).rows_between(start, end), exclude)
+	return distance_view(rows, isotope, get_station_index(fingerprint))
+
+@trace.traced("get_surfaces", cached=True)
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_surfaces(fingerprint: str):
+	"""Precomputed IDW surfaces (utils/surface.py), memory-mapped; None until `make surfaces` has run."""
+	trace.cache_miss()
+	return surface.load_surfaces()
+
+@cache.memoized("get_surface_image")
+def get_surface_image(fingerprint: str, start, end, isotope: str):
+	"""BitmapLayer payload of the mean surface of a (date range, isotope): PNG data URL + bounds, or None."""
+	surfaces = get_surfaces(fingerprint)
+	grid = None if surfaces is None else surfaces.mean(isotope, start, end)
+	if grid is None:
+		return None
+	return {"image": surface.to_image(grid, surfaces.bounds), "bounds": surfaces.bounds}
+
+@cache.memoized("get_playback_html")
+def get_playback_html(fingerprint: str, isotope: str, zoom: int, exclude: int = 0) -> str:
+	"""Playback page with every day's station means of an isotope in one payload (utils/playback.py)."""
+	payload = playback.playback_payload(get_range_engine(fingerprint, exclude), isotope)
+	return playback.playback_html(payload, isotope, zoom=zoom)
 
 
 # --- 2️⃣ Sidebar filters ---
-raw, tables = get_data()
+fingerprint = data_fingerprint()
+tables = get_data(fingerprint)
 st.sidebar.header("Filters")
 
+# QC flags (utils/qc.py): readings carrying any of the selected flags are left out of the map and charts
+hidden_flags = st.sidebar.multiselect(
+	"Hide flagged readings",
+	# missing readings are never filled (NaN), so 'not measured' has nothing left to hide
+	[label for label, bit in qc.FLAGS.items() if bit != qc.NOT_MEASURED],
+	default=[],
+	help="Leave out readings by QC flag: below the detection limit ('<0.01'), decimal comma, same station and "
+		"date reported twice, or robust outlier against the station's neighbouring days. "
+		"Applies to the map, ranking, trend, distance and playback views."
+)
+exclude = qc.bits(hidden_flags)
+date_index = get_date_index(fingerprint)
+
 isotope_cols = ["I_131_(Bq/m3)", "Cs_134_(Bq/m3)", "Cs_137_(Bq/m3)"]
 
 # Filter by isotope
@@ -51,91 +183,72 @@ selected_isotope = st.sidebar.selectbox(
 )
 
 # Filter by date
-min_date = raw["Date"].min().date()
-max_date = raw["Date"].max().date()
-selected_date = st.sidebar.slider(
-	"Select date",
+min_date = date_index.first_day
+max_date = date_index.last_day
+start_date, end_date = st.sidebar.slider(
+	"Select date range",
 	min_value=min_date,
 	max_value=max_date,
-	value=min_date,
+	value=(min_date, min_date),
 	format="YYYY-MM-DD",
-	help="Slide to pick a single date to filter map points and daily summaries (date-only match)."
+	help="Drag both ends to pick a date range (or a single day) for the map and the regional ranking. Stations show their mean over the range."
+)
+
+# Map level of detail: individual stations, or grid cells aggregated server-side
+map_detail = st.sidebar.selectbox(
+	"Map detail",
+	("Auto", "Stations", "Grid cells"),
+	help=f"Auto switches to grid cells (sum / max / count per cell) above {viz.LOD_POINT_THRESHOLD} points."
 )
+map_zoom = st.sidebar.slider("Map zoom", min_value=3, max_value=9, value=5,
+	help="Initial map zoom; also sets the grid cell size when points are aggregated.")
+show_playback = st.sidebar.checkbox("Date playback", value=False,
+	help="Animate the map day by day in the browser: all days are sent once, play / pause / speed need no rerun.")
+show_surface = st.sidebar.checkbox("Interpolated surface", value=False,
+	help="Shade the map between stations with a precomputed inverse-distance interpolation (run `make surfaces` first).")
 
-# Filter the map data for the selected date
-df_map = tables["clean"].copy()
-df_map["Date"] = pd.to_datetime(df_map["Date"], format="%y/%m/%d", errors="coerce")
-df_map = df_map.dropna(subset=["Date"])
-# comparer uniquement la partie "date" (sans timestamp)
-df_map = df_map[df_map["Date"].dt.date == selected_date]
+# Rows of the selected range: a slice of the date-sorted table (no scan, no copy)
+with trace.span("date_filter", rows_in=len(date_index.frame)) as s:
+	df_map = date_index.rows_between(start_date, end_date)
+	s.rows_out = len(df_map)
 
 # --- Prepare map data and deck using viz helpers (so sections can reuse them)
-df_filtered = viz.prepare_map_data(df_map, selected_isotope, scale=1000.0 * 5)
+df_filtered = get_map_data(fingerprint, start_date, end_date, selected_isotope, exclude)
 with st.expander("Debug: map data diagnostics", expanded=False):
 	st.write("Total rows after date filter:", len(df_map))
-	st.write("Rows after numeric coercion and coord filter:", len(df_filtered))
+	st.write("Stations after numeric coercion and coord filter:", len(df_filtered))
 	if len(df_filtered) > 0:
 		st.dataframe(df_filtered[["Location", "Latitude", "Longitude", "Value", "radius"]].head(10))
 	else:
 		st.write("No valid rows for the selected date/isotope. Check that the chosen isotope column contains numeric values for that date.")
+	st.write("QC flags per isotope (readings of the whole dataset):")
+	st.dataframe(qc.summary(tables["clean"]), hide_index=True)
+	st.write("Memory per loaded table (see utils/schema.py for column types; unread tables are not built):")
+	st.dataframe(memory_report(tables.built()), hide_index=True)
 
-# Build deck (single object) for use in Insights
-r = viz.build_deck(df_filtered, selected_isotope)
 if df_filtered.empty:
-	st.warning("No data points for the selected date and isotope. Try another date or isotope.")
+	st.warning("No data points for the selected date range and isotope. Try another range or isotope.")
 
-# --- 3️⃣ Intro section ---
-# Compute timeseries-derived dataframe and KPIs early so KPIs can be shown everywhere
-df_time = tables["timeseries"].melt(id_vars="Date", value_vars=isotope_cols,
-                                    var_name="Isotope", value_name="Concentration")
-
-# Protect idxmax usage if all NaN
-if df_time["Concentration"].dropna().empty:
-	max_row = pd.Series({"Date": pd.NaT, "Concentration": float("nan")})
-else:
-	max_row = df_time.loc[df_time["Concentration"].idxmax()]
+# Trend chart payload: capped points per isotope, full resolution when zoomed to a short range
+trend_zoom = st.sidebar.checkbox("Zoom trend chart to the selected range", value=False,
+	help="Show the trend chart for the selected date range only; short ranges are drawn at full resolution.")
+trend_points = st.sidebar.number_input("Max trend points per isotope", min_value=100, max_value=20000, value=1000, step=100,
+	help="Longer series are reduced to the min and max of equal-size buckets, which keeps every peak.")
 
-# --- Robust approx daily decay rate (log-difference per day) ---
-def _approx_daily_decay_pct(df_time: pd.DataFrame) -> float:
-	"""
-	Estimate average daily percent change across isotopes.
+# --- 3️⃣ Intro section ---
+# Compute the peak KPIs early so they can be shown everywhere
+max_row = get_peak(fingerprint, tuple(isotope_cols))
 
-	Doc: for debugging or explanation call st.help(_approx_daily_decay_pct)
-	"""
-	rates = []
-	for name, g in df_time.groupby("Isotope"):
-		g = g.sort_values("Date")
-		vals = pd.to_numeric(g["Concentration"], errors="coerce")
-		dates = pd.to_datetime(g["Date"], errors="coerce")
-		dfg = pd.DataFrame({"Date": dates, "Val": vals}).dropna(subset=["Date", "Val"])
-		# need positive values to compute logs
-		dfg = dfg[dfg["Val"] > 0].copy()
-		if len(dfg) < 2:
-			continue
-		dfg["delta_days"] = dfg["Date"].diff().dt.total_seconds() / 86400.0
-		dfg["logdiff"] = np.log(dfg["Val"] / dfg["Val"].shift(1))
-		dfg = dfg.dropna(subset=["delta_days", "logdiff"])
-		# avoid zero-day intervals
-		dfg = dfg[dfg["delta_days"] > 0]
-		if dfg.empty:
-			continue
-		dfg["daily_log_rate"] = dfg["logdiff"] / dfg["delta_days"]
-		# use median to reduce influence of outliers
-		rates.append(dfg["daily_log_rate"].median())
-	if not rates:
-		return float("nan")
-	avg_daily_log = float(np.mean(rates))
-	# convert back to percent change per day
-	return (np.exp(avg_daily_log) - 1.0) * 100.0
-
-decay_rate = _approx_daily_decay_pct(df_time)
+# --- Robust approx daily decay rate (log-difference per day) + per-isotope half-life fits ---
+decay_rate, isotope_fits = get_decay(fingerprint, tuple(isotope_cols))
 
 # Help expander exposing docstrings for key helpers and quick widget tips
 with st.sidebar.expander("Help & function docs", expanded=False):
 	st.write("Quick help for internal helpers and widget tips.")
 	# show function docstrings / signatures for maintainers or curious users
 	st.help(get_data)
-	st.help(_approx_daily_decay_pct)
+	st.help(decay.approx_daily_decay_pct)
+	st.help(decay.fit_decay)
 	st.caption("Widget tips: click the (i) help icon next to sidebar controls or hover over them where supported.")
 
 # Present a non-negative user-facing metric and a direction label
@@ -152,33 +265,29 @@ else:
 	else:
 		decay_direction = "stable"
 
-# Build the line chart object here so it is defined before narrative branches use it.
-line_chart = alt.Chart(df_time).mark_line().encode(
-    x="Date:T",
-    y="Concentration:Q",
-    color="Isotope:N"
-).properties(height=300)
-
 # Render intro section (title + KPIs) from the dedicated module
-intro.render_intro(max_row, decay_display, decay_direction)
+with trace.span("sections.intro.render_intro"):
+	intro.render_intro(max_row, decay_display, decay_direction)
 
 # --- Narrative controller (Problem → Analysis → Insights → Implications) ---
 narrative_step = st.sidebar.radio(
 	"Dashboard narrative",
 	("Problem", "Analysis", "Insights", "Implications"),
-	index=1
+	index=1,
+	key="narrative_step"
 )
 
 # Short guidance visible at top of main pane
 st.markdown(f"**Mode:** {narrative_step} — follow the steps to understand the problem, analyze the data and derive conclusions.")
 
 # --- Display content per narrative step ---
+# Each step imports its section module and builds its charts / deck only when it is shown.
 if narrative_step == "Problem":
 	st.header("Problem — What happened?")
 	st.markdown("""
 	- An episode of atmospheric contamination was detected after the Chernobyl accident.
 	- Central question: where and when were airborne concentrations highest?
-	- Use the isotope selector and the date slider in the sidebar to focus on a specific isotope and date.
+	- Use the isotope selector and the date range slider in the sidebar to focus on a specific isotope and period.
 	""")
 	st.subheader("Peak event summary")
 	st.markdown(f"- Peak date observed (all stations, all isotopes): **{max_row['Date'].strftime('%Y-%m-%d')}**")
@@ -186,11 +295,56 @@ if narrative_step == "Problem":
 	st.info("Switch to 'Analysis' to inspect trends and regional distribution.")
 
 if narrative_step == "Analysis":
+	from sections import overview
+	# Trend chart: capped points per isotope, whole period unless zoomed to the selected range
+	trend_range = (start_date, end_date) if trend_zoom else (None, None)
+	df_trend = get_trend_data(fingerprint, tuple(isotope_cols), *trend_range, int(trend_points), exclude)
+	line_chart = viz.build_line_chart(df_trend)
+	top10 = get_top10(fingerprint, start_date, end_date, exclude)
+	station_fits = get_station_fits(fingerprint, tuple(isotope_cols))
 	# Delegate all Analysis rendering (trends, regional breakdown, half-life) to the overview section
-	overview.render_analysis(line_chart, df_map, isotope_cols, max_row, decay_display, decay_direction)
+	with trace.span("sections.overview.render_analysis", rows_in=len(df_trend)):
+		overview.render_analysis(line_chart, top10, max_row, decay_display, decay_direction, isotope_fits, station_fits)
 
 if narrative_step == "Insights":
-	deepdives.render_insights(r, df_filtered)
+	from sections import deepdives
+	# Deck: individual stations, or server-side grid cells above the point threshold
+	use_cells = map_detail == "Grid cells" or (map_detail == "Auto" and len(df_filtered) > viz.LOD_POINT_THRESHOLD)
+	map_cells = get_map_cells(fingerprint, start_date, end_date, selected_isotope, map_zoom, exclude) if use_cells else None
+	# Interpolated surface: read from the precomputed, memory-mapped grids (never interpolated here)
+	map_surface = get_surface_image(fingerprint, start_date, end_date, selected_isotope) if show_surface else None
+	if show_surface and get_surfaces(fingerprint) is None:
+		st.sidebar.info("No interpolated surfaces for this dataset yet: run `make surfaces`.")
+	with trace.span("build_deck", rows_in=len(df_filtered if map_cells is None else map_cells)):
+		r = viz.build_deck(df_filtered, selected_isotope, zoom=map_zoom, cells=map_cells, surface=map_surface)
+	with trace.span("sections.deepdives.render_insights", rows_in=len(df_filtered)):
+		deepdives.render_insights(r, df_filtered, interpolated=map_surface is not None)
+	if show_playback:
+		with trace.span("sections.deepdives.render_playback"):
+			deepdives.render_playback(get_playback_html(fingerprint, selected_isotope, map_zoom, exclude))
+	df_distance = get_distance_view(fingerprint, start_date, end_date, selected_isotope, exclude)
+	with trace.span("sections.deepdives.render_distance", rows_in=len(df_distance)):
+		deepdives.render_distance(viz.build_distance_chart(df_distance, selected_isotope), get_station_index(fingerprint))
 
 if narrative_step == "Implications":
-	conclusions.render_implications()
+	from sections import conclusions
+	with trace.span("sections.conclusions.render_implications"):
+		conclusions.render_implications()
+
+# --- Diagnostics: timing / memory / cache outcome of every traced stage in this rerun ---
+with st.sidebar.expander("Diagnostics: stage timings", expanded=False):
+	st.caption("Wall time, rows in/out, resident memory change and cache outcome per stage for this rerun "
+		"(nested stages are indented). Set TRACE_LOG=<file> to also log them as JSON lines.")
+	stats = cache.RESULTS.stats()
+	hit_rate = "n/a" if stats["hit_rate"] is None else f"{stats['hit_rate']:.0%}"
+	st.caption(f"Shared result cache (all sessions): {stats['entries']} entries, {stats['mb']:.1f} of "
+		f"{stats['budget_mb']:.0f} MB (RESULT_CACHE_MB) — {stats['hits']} hits, {stats['misses']} misses "
+		f"({hit_rate} hit rate), {stats['evictions']} evictions.")
+	st.dataframe(
+		trace.spans_frame(),
+		hide_index=True,
+		column_config={
+			"ms": st.column_config.NumberColumn("ms", format="%.1f"),
+			"rss_delta_mb": st.column_config.NumberColumn("RSS Δ (MB)", format="%.1f"),
+		},
+	)
@@ -0,0 +1 @@
+"""Benchmarks for the data pipeline, run on synthetic data shaped like the real CSV."""
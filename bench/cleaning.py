@@ -0,0 +1,62 @@
+"""
+Benchmark of the cleaning stage of utils.prep.make_tables on synthetic data.
+
+Usage:
+	python -m bench.cleaning [--sizes 10000,100000,1000000,10000000] [--legacy-max-rows 100000]
+
+Prints wall time and nanoseconds per row for the vectorized engine (prep.clean_frame and the
+whole make_tables) and, up to --legacy-max-rows, for the former applymap/regex/lambda path.
+A constant ns/row across sizes means the stage scales linearly.
+"""
+import argparse
+import contextlib
+import io
+import time
+
+import pandas as pd
+
+from utils import prep
+from bench.synthetic import make_raw
+
+def _legacy_clean(df: pd.DataFrame) -> pd.DataFrame:
+	"""Former cleaning path (per-cell applymap, regex extraction, lambda groupby fill)."""
+	df.columns = df.columns.str.strip()
+	df = df.applymap(lambda x: x.strip() if isinstance(x, str) else x)
+	df["Date"] = pd.to_datetime(df["Date"], format="%y/%m/%d", errors="coerce")
+	for col in prep.ISOTOPE_COLS:
+		df[col] = df[col].astype(str).str.replace(",", ".").str.extract(r"(\d+\.\d+|\d+)")[0].astype(float)
+	df = df.drop_duplicates()
+	df[prep.ISOTOPE_COLS] = df.groupby("Location")[prep.ISOTOPE_COLS].transform(lambda x: x.fillna(x.mean()))
+	return df
+
+def _timed(fn, *args) -> float:
+	start = time.perf_counter()
+	with contextlib.redirect_stdout(io.StringIO()):
+		fn(*args)
+	return time.perf_counter() - start
+
+def run(sizes, legacy_max_rows: int) -> pd.DataFrame:
+	results = []
+	for n_rows in sizes:
+		raw = make_raw(n_rows)
+		stages = {
+			"vectorized clean": lambda: prep.clean_frame(raw.copy()),
+			"make_tables": lambda: prep.make_tables(raw),
+		}
+		if n_rows <= legacy_max_rows:
+			stages["legacy clean"] = lambda: _legacy_clean(raw.copy())
+		for name, fn in stages.items():
+			seconds = _timed(fn)
+			results.append({"rows": n_rows, "stage": name, "seconds": round(seconds, 3), "ns/row": round(seconds / n_rows * 1e9)})
+			print(f"{n_rows:>10,} rows  {name:<17} {seconds:8.3f} s  {seconds / n_rows * 1e9:8.0f} ns/row", flush=True)
+	return pd.DataFrame(results)
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--sizes", default="10000,100000,1000000,10000000", help="comma-separated row counts")
+	parser.add_argument("--legacy-max-rows", type=int, default=100_000, help="largest size also run through the legacy path")
+	args = parser.parse_args(argv)
+	run([int(s) for s in args.sizes.split(",")], args.legacy_max_rows)
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,203 @@
+"""
+Checks of utils.download.download() against local HTTP stand-ins, without network access.
+
+Usage:
+	python -m bench.download
+
+Each scenario serves generated bytes from a ThreadingHTTPServer on 127.0.0.1 and downloads them
+into a temporary folder:
+	plain          http.server's SimpleHTTPRequestHandler (no Range): single stream, sha256 checked
+	not modified   the same server again: If-Modified-Since from the .meta.json sidecar, 304, no download
+	checksum       a wrong sha256: the download is rejected and nothing is renamed onto the destination
+	parallel       a Range-capable server (ETag, If-Range) and a file above PARALLEL_MIN_BYTES:
+	               SEGMENTS byte ranges fetched in parallel
+	etag           the same server again: If-None-Match, 304
+	retry          a server dropping the connection mid-body: resumed in-process with Range requests
+	resume         every attempt dropped (the .part file is kept), then a later run finishes it
+	               from the saved ranges instead of starting over
+Prints one line per scenario and exits with status 1 if any check fails.
+"""
+import contextlib
+import hashlib
+import os
+import socket
+import sys
+import tempfile
+import threading
+from email.utils import formatdate
+from functools import partial
+from http.server import BaseHTTPRequestHandler, SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from utils import download as dl
+
+class QuietFileHandler(SimpleHTTPRequestHandler):
+	"""http.server's file handler (no Range support), without the request log on stderr."""
+
+	def log_message(self, *args):
+		pass
+
+class RangeHandler(BaseHTTPRequestHandler):
+	"""
+	GET of one in-memory file with ETag / Last-Modified, single byte ranges, If-Range and
+	If-None-Match. `drop_after` > 0 closes the connection after that many body bytes, for the
+	first `drops` requests. Every request is logged as (Range header, status) in `requests`.
+	"""
+	body = b""
+	etag = '"v1"'
+	drop_after = 0
+	drops = 0
+	requests = None
+	lock = threading.Lock()
+
+	def log_message(self, *args):
+		pass
+
+	def _log(self, status):
+		with self.lock:
+			self.requests.append((self.headers.get("Range"), status))
+
+	def do_GET(self):
+		cls = type(self)
+		if self.headers.get("If-None-Match") == cls.etag:
+			self._log(304)
+			self.send_response(304)
+			self.end_headers()
+			return
+		start, end = 0, len(cls.body)
+		status = 200
+		wanted = self.headers.get("Range")
+		if wanted and self.headers.get("If-Range", cls.etag) == cls.etag:
+			first, _, last = wanted.removeprefix("bytes=").partition("-")
+			start, end = int(first), int(last) + 1 if last else len(cls.body)
+			status = 206
+		self._log(status)
+		self.send_response(status)
+		self.send_header("ETag", cls.etag)
+		self.send_header("Last-Modified", formatdate(0, usegmt=True))
+		self.send_header("Accept-Ranges", "bytes")
+		self.send_header("Content-Length", str(end - start))
+		if status == 206:
+			self.send_header("Content-Range", f"bytes {start}-{end - 1}/{len(cls.body)}")
+		self.end_headers()
+		payload = cls.body[start:end]
+		with cls.lock:
+			drop = cls.drops > 0 and cls.drop_after > 0
+			if drop:
+				cls.drops -= 1
+		if drop:
+			self.wfile.write(payload[:cls.drop_after])
+			self.wfile.flush()
+			self.close_connection = True
+			self.connection.shutdown(socket.SHUT_RDWR)
+			return
+		self.wfile.write(payload)
+
+class QuietServer(ThreadingHTTPServer):
+	"""Clients closing a stream early (the probe request, dropped bodies) are expected: no traceback."""
+
+	def handle_error(self, request, client_address):
+		pass
+
+def range_handler(body: bytes, drop_after: int = 0, drops: int = 0):
+	"""A RangeHandler subclass serving `body` (its own request log and drop counter)."""
+	return type("Handler", (RangeHandler,), {"body": body, "drop_after": drop_after, "drops": drops, "requests": []})
+
+@contextlib.contextmanager
+def serve(handler):
+	"""Run `handler` on a free local port; yields the base URL."""
+	server = QuietServer(("127.0.0.1", 0), handler)
+	thread = threading.Thread(target=server.serve_forever, daemon=True)
+	thread.start()
+	try:
+		yield f"http://127.0.0.1:{server.server_port}"
+	finally:
+		server.shutdown()
+		server.server_close()
+
+def payload(n_bytes: int, seed: int = 0) -> bytes:
+	"""Deterministic, non-repeating bytes (so a misplaced range changes the digest)."""
+	blocks, counter = [], 0
+	while sum(len(b) for b in blocks) < n_bytes:
+		blocks.append(hashlib.sha256(f"{seed}-{counter}".encode()).digest() * 128)
+		counter += 1
+	return b"".join(blocks)[:n_bytes]
+
+def _sha(data: bytes) -> str:
+	return hashlib.sha256(data).hexdigest()
+
+def _quiet(fn, *args, **kwargs):
+	with contextlib.redirect_stdout(open(os.devnull, "w")):
+		return fn(*args, **kwargs)
+
+def run(tmp: Path) -> list:
+	"""(scenario, ok, detail) of every check."""
+	results = []
+	def check(name, ok, detail=""):
+		results.append((name, bool(ok), detail))
+
+	# --- http.server: no Range support, Last-Modified only ---
+	small = payload(3 * dl.CHUNK_SIZE + 123)
+	site = tmp / "site"
+	site.mkdir()
+	(site / "data.csv").write_bytes(small)
+	with serve(partial(QuietFileHandler, directory=str(site))) as base:
+		dest = tmp / "plain.csv"
+		fetched = _quiet(dl.download, f"{base}/data.csv", dest, sha256=_sha(small))
+		check("plain", fetched and dest.read_bytes() == small and dl._meta_path(dest).exists()
+			and not dl._part_path(dest).exists())
+		fetched = _quiet(dl.download, f"{base}/data.csv", dest, sha256=_sha(small))
+		check("not modified", fetched is False and dest.read_bytes() == small)
+		dest = tmp / "checksum.csv"
+		try:
+			_quiet(dl.download, f"{base}/data.csv", dest, sha256="0" * 64)
+			check("checksum", False, "no error raised")
+		except RuntimeError as e:
+			check("checksum", not dest.exists() and not dl._part_path(dest).exists(), str(e)[:60])
+
+	# --- Range-capable server: parallel byte ranges, then a 304 on the ETag ---
+	large = payload(dl.PARALLEL_MIN_BYTES + 5 * dl.CHUNK_SIZE + 7, seed=1)
+	handler = range_handler(large)
+	with serve(handler) as base:
+		dest = tmp / "parallel.csv"
+		_quiet(dl.download, f"{base}/data.csv", dest, sha256=_sha(large))
+		ranges = [r for r, status in handler.requests if status == 206]
+		check("parallel", dest.read_bytes() == large and len(ranges) == dl.SEGMENTS, f"{len(ranges)} ranges")
+		fetched = _quiet(dl.download, f"{base}/data.csv", dest)
+		check("etag", fetched is False and handler.requests[-1][1] == 304)
+
+	# --- connection dropped mid-body once: resumed within the same call ---
+	medium = payload(12 * dl.CHUNK_SIZE + 5, seed=2)
+	handler = range_handler(medium, drop_after=10 * dl.CHUNK_SIZE, drops=1)
+	with serve(handler) as base:
+		dest = tmp / "retry.csv"
+		_quiet(dl.download, f"{base}/data.csv", dest, sha256=_sha(medium))
+		resumed = [r for r, status in handler.requests if status == 206 and not r.startswith("bytes=0-")]
+		check("retry", dest.read_bytes() == medium and resumed, f"ranges {resumed}")
+
+	# --- every attempt dropped: .part kept, the next run resumes from the saved ranges ---
+	handler = range_handler(medium, drop_after=2 * dl.CHUNK_SIZE, drops=dl.RETRIES * 2)
+	with serve(handler) as base:
+		dest = tmp / "resume.csv"
+		try:
+			_quiet(dl.download, f"{base}/data.csv", dest, sha256=_sha(medium))
+			kept = False
+		except RuntimeError:
+			kept = dl._part_path(dest).exists() and dl._state_path(dest).exists() and not dest.exists()
+		handler.drops = 0
+		handler.requests.clear()
+		_quiet(dl.download, f"{base}/data.csv", dest, sha256=_sha(medium))
+		resumed = [r for r, status in handler.requests if status == 206]
+		check("resume", kept and dest.read_bytes() == medium and resumed and not resumed[0].startswith("bytes=0-"),
+			f"ranges {resumed}")
+	return results
+
+def main() -> int:
+	with tempfile.TemporaryDirectory() as tmp:
+		results = run(Path(tmp))
+	for name, ok, detail in results:
+		print(f"{'ok  ' if ok else 'FAIL'} {name:<13} {detail}")
+	return 0 if all(ok for _, ok, _ in results) else 1
+
+if __name__ == "__main__":
+	sys.exit(main())
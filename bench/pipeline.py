@@ -0,0 +1,188 @@
+"""
+Benchmark of the load → prep → render pipeline on synthetic data.
+
+Usage:
+	python -m bench.pipeline [--sizes 2000,20000,200000,2000000,10000000] [--output bench-pipeline.json]
+	python -m bench.pipeline --sizes 2000,20000 --compare bench-baseline.json [--tolerance 0.25]
+
+Each size is written to a temporary CSV (see bench.synthetic) and run through the app's stages:
+	load                   utils.io.read_raw, as in the build of utils.io.load_tables()
+	make_tables            utils.prep.make_tables on the raw frame
+	make_tables_streaming  utils.prep.make_tables_streaming on the CSV (path used for large files)
+	prepare_map_data       viz.prepare_map_data on every clean row (full date range, worst case)
+	build_deck             viz.build_deck + JSON payload, grid cells above viz.LOD_POINT_THRESHOLD
+	decay                  decay rate and half-life fits, the body of app.get_decay()
+	surfaces               utils.surface.write_surfaces: IDW grid of every day × isotope, written to disk
+
+Wall time is the best of up to --repeat runs (fewer once a stage has used about a second). Peak
+memory is the tracemalloc peak above the stage inputs, measured in a separate run so tracing does
+not inflate the timings (numpy and pandas buffers are traced, Arrow buffers are not). Results are written as JSON; with --compare, stages slower or
+heavier than the baseline by more than --tolerance are reported and the exit status is 1.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils import decay, prep, surface, viz
+from utils.index import DateIndex
+from utils.prefix import StationPrefixSums
+from utils.io import read_raw
+from utils.schema import ISOTOPE_COLS
+from bench.synthetic import write_csv
+
+DEFAULT_SIZES = "2000,20000,200000,2000000,10000000"
+STAGES = ("load", "make_tables", "make_tables_streaming", "prepare_map_data", "build_deck", "decay", "surfaces")
+ISOTOPE = "Cs_137_(Bq/m3)"
+
+def _deck_json(prepared: pd.DataFrame) -> str:
+	cells = None
+	if len(prepared) > viz.LOD_POINT_THRESHOLD:
+		cells = viz.aggregate_cells(prepared, viz.cell_size_for_zoom(5))
+	return viz.build_deck(prepared, ISOTOPE, cells=cells).to_json()
+
+def _decay(tables: dict):
+	df_time = tables["timeseries"].melt(id_vars="Date", value_vars=ISOTOPE_COLS, var_name="Isotope", value_name="Concentration")
+	return (
+		decay.approx_daily_decay_pct(df_time),
+		decay.fit_decay(tables["timeseries"], ISOTOPE_COLS),
+		decay.fit_decay(tables["clean"], ISOTOPE_COLS, by=["Location"]),
+	)
+
+def _measure(fn, repeat: int, memory: bool, budget: float = 1.0):
+	"""(best wall time in seconds, peak traced MB above the starting allocation or None, last result)."""
+	best, spent = float("inf"), 0.0
+	result = None
+	for _ in range(repeat):
+		result = None
+		start = time.perf_counter()
+		with contextlib.redirect_stdout(io.StringIO()):
+			result = fn()
+		elapsed = time.perf_counter() - start
+		best, spent = min(best, elapsed), spent + elapsed
+		if spent >= budget:
+			break
+	peak_mb = None
+	if memory:
+		result = None
+		tracemalloc.start()
+		base, _ = tracemalloc.get_traced_memory()
+		with contextlib.redirect_stdout(io.StringIO()):
+			result = fn()
+		_, peak = tracemalloc.get_traced_memory()
+		tracemalloc.stop()
+		peak_mb = (peak - base) / 1e6
+	return best, peak_mb, result
+
+def run_size(n_rows: int, repeat: int = 5, memory: bool = True, stages=STAGES) -> list:
+	"""Run the pipeline stages on `n_rows` synthetic rows; one result dict per stage."""
+	results = []
+	with tempfile.TemporaryDirectory() as tmp:
+		csv_path = Path(tmp) / "synthetic.csv"
+		write_csv(csv_path, n_rows)
+		csv_mb = csv_path.stat().st_size / 1e6
+		state = {}
+		steps = {
+			"load": lambda: read_raw(csv_path),
+			"make_tables": lambda: prep.make_tables(state["load"]),
+			"make_tables_streaming": lambda: prep.make_tables_streaming(csv_path),
+			"prepare_map_data": lambda: viz.prepare_map_data(state["make_tables"]["clean"], ISOTOPE),
+			"build_deck": lambda: _deck_json(state["prepare_map_data"]),
+			"decay": lambda: _decay(state["make_tables"]),
+			"surfaces": lambda: surface.write_surfaces(csv_path, {}, StationPrefixSums(DateIndex(state["make_tables"]["clean"]))),
+		}
+		for stage in STAGES:
+			# stages feeding later ones always run; the others only when selected
+			needed = stage in stages or stage in ("load", "make_tables", "prepare_map_data")
+			if not needed:
+				continue
+			seconds, peak_mb, state[stage] = _measure(steps[stage], repeat, memory and stage in stages)
+			if stage not in stages:
+				continue
+			row = {
+				"rows": n_rows,
+				"stage": stage,
+				"seconds": round(seconds, 4),
+				"ns_per_row": round(seconds / n_rows * 1e9),
+				"peak_mb": None if peak_mb is None else round(peak_mb, 2),
+				"csv_mb": round(csv_mb, 2),
+			}
+			results.append(row)
+			peak = "" if peak_mb is None else f"{peak_mb:10.1f} MB"
+			print(f"{n_rows:>10,} rows  {stage:<22} {seconds:8.3f} s  {row['ns_per_row']:8d} ns/row{peak}", flush=True)
+		state.clear()
+	return results
+
+def environment() -> dict:
+	return {
+		"python": platform.python_version(),
+		"platform": platform.platform(),
+		"cpus": os.cpu_count(),
+		"numpy": np.__version__,
+		"pandas": pd.__version__,
+	}
+
+def compare(results: list, baseline: list, tolerance: float, min_seconds: float = 0.1) -> list:
+	"""
+	Regressions of `results` against `baseline` (matched on rows, when present, + stage): one message
+	per stage whose time or peak memory grew by more than `tolerance` (relative). Times under
+	`min_seconds` in both runs are treated as noise.
+	"""
+	previous = {(r.get("rows"), r["stage"]): r for r in baseline}
+	problems = []
+	for r in results:
+		old = previous.get((r.get("rows"), r["stage"]))
+		if old is None:
+			continue
+		label = f"{r['rows']:,} rows {r['stage']}" if r.get("rows") else r["stage"]
+		if max(r["seconds"], old["seconds"]) >= min_seconds and r["seconds"] > old["seconds"] * (1 + tolerance):
+			problems.append(f"{label}: {old['seconds']:.3f} s → {r['seconds']:.3f} s")
+		if r.get("peak_mb") and old.get("peak_mb") and r["peak_mb"] > old["peak_mb"] * (1 + tolerance) and r["peak_mb"] - old["peak_mb"] > 1:
+			problems.append(f"{label}: {old['peak_mb']:.1f} MB → {r['peak_mb']:.1f} MB peak")
+	return problems
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated row counts")
+	parser.add_argument("--stages", default=",".join(STAGES), help="comma-separated subset of: " + ", ".join(STAGES))
+	parser.add_argument("--repeat", type=int, default=5, help="max timed runs per stage (best is kept)")
+	parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+	parser.add_argument("--output", default="bench-pipeline.json", help="JSON results file")
+	parser.add_argument("--compare", help="baseline JSON file to check the results against")
+	parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown / memory growth")
+	args = parser.parse_args(argv)
+
+	stages = [s for s in args.stages.split(",") if s]
+	unknown = sorted(set(stages) - set(STAGES))
+	if unknown:
+		parser.error(f"unknown stages: {', '.join(unknown)}")
+	results = []
+	for n_rows in (int(s) for s in args.sizes.split(",")):
+		results.extend(run_size(n_rows, args.repeat, not args.no_memory, stages))
+
+	report = {"environment": environment(), "results": results}
+	Path(args.output).write_text(json.dumps(report, indent=2))
+	print(f"Results written to {args.output}")
+
+	if args.compare:
+		baseline = json.loads(Path(args.compare).read_text())["results"]
+		problems = compare(results, baseline, args.tolerance)
+		if problems:
+			print(f"Regressions against {args.compare} (tolerance {args.tolerance:.0%}):")
+			for line in problems:
+				print("  " + line)
+			sys.exit(1)
+		print(f"No regression against {args.compare} (tolerance {args.tolerance:.0%}).")
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,106 @@
+"""
+Benchmark of the dashboard start-up: import times and first paint per narrative step.
+
+Usage:
+	python -m bench.startup [--repeat 3] [--output bench-startup.json] [--compare bench-startup-baseline.json]
+
+Every measurement runs in a fresh interpreter, like a new container:
+	import <module>        time to import one module (with its own dependencies) after streamlit + pandas
+	first paint <step>     first full run of app.py opened on that narrative step (streamlit AppTest),
+	                       i.e. everything drawn before the page is complete; the loaded heavy modules
+	                       are listed with each result
+	rerun <step>           a second run in the same process (st.cache_* warm)
+The table cache in data/ is used as it is; `make clean-cache` first to include the table build.
+Results and --compare work like bench.pipeline (best of --repeat processes).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from bench.pipeline import compare, environment
+
+ROOT = Path(__file__).resolve().parents[1]
+STEPS = ("Problem", "Analysis", "Insights", "Implications")
+MODULES = ("numpy", "pyarrow", "altair", "pydeck", "requests", "sklearn.preprocessing",
+	"utils.io", "utils.viz", "sections.overview", "sections.deepdives")
+# heavy optional modules reported as loaded / not loaded after a first paint
+WATCHED = ("altair", "pydeck", "requests", "sklearn")
+
+_IMPORT = """
+import importlib, json, time
+import streamlit, pandas
+start = time.perf_counter()
+importlib.import_module({module!r})
+print(json.dumps({{"seconds": time.perf_counter() - start}}))
+"""
+
+_FIRST_PAINT = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("app.py", default_timeout=600)
+at.session_state["narrative_step"] = {step!r}
+at.run()
+first = time.perf_counter() - start
+start = time.perf_counter()
+at.run()
+rerun = time.perf_counter() - start
+errors = [str(e.value) for e in at.exception]
+loaded = [m for m in {watched!r} if m in sys.modules]
+print(json.dumps({{"first": first, "rerun": rerun, "errors": errors, "loaded": loaded}}))
+"""
+
+def _run(code: str) -> dict:
+	"""Run `code` in a fresh interpreter from the repository root; its last stdout line is JSON."""
+	proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True,
+		env={**os.environ, "PYTHONPATH": str(ROOT)})
+	if proc.returncode != 0:
+		raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}")
+	return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def run(repeat: int = 3, steps=STEPS, modules=MODULES) -> list:
+	results = []
+	for module in modules:
+		seconds = min(_run(_IMPORT.format(module=module))["seconds"] for _ in range(repeat))
+		results.append({"stage": f"import {module}", "seconds": round(seconds, 4)})
+		print(f"import {module:<24} {seconds * 1000:8.0f} ms", flush=True)
+	for step in steps:
+		runs = [_run(_FIRST_PAINT.format(step=step, watched=WATCHED)) for _ in range(repeat)]
+		if runs[0]["errors"]:
+			raise RuntimeError(f"app.py failed on {step}: {runs[0]['errors'][0]}")
+		first = min(r["first"] for r in runs)
+		rerun = min(r["rerun"] for r in runs)
+		loaded = runs[0]["loaded"]
+		results.append({"stage": f"first paint {step}", "seconds": round(first, 4), "loaded": loaded})
+		results.append({"stage": f"rerun {step}", "seconds": round(rerun, 4)})
+		print(f"first paint {step:<17} {first * 1000:8.0f} ms  rerun {rerun * 1000:6.0f} ms  "
+			f"loaded: {', '.join(loaded) or '-'}", flush=True)
+	return results
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--repeat", type=int, default=3, help="fresh processes per measurement (best is kept)")
+	parser.add_argument("--steps", default=",".join(STEPS), help="comma-separated narrative steps")
+	parser.add_argument("--output", default="bench-startup.json", help="JSON results file")
+	parser.add_argument("--compare", help="baseline JSON file to check the results against")
+	parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+	args = parser.parse_args(argv)
+
+	results = run(args.repeat, [s for s in args.steps.split(",") if s])
+	Path(args.output).write_text(json.dumps({"environment": environment(), "results": results}, indent=2))
+	print(f"Results written to {args.output}")
+
+	if args.compare:
+		problems = compare(results, json.loads(Path(args.compare).read_text())["results"], args.tolerance)
+		if problems:
+			print(f"Regressions against {args.compare} (tolerance {args.tolerance:.0%}):")
+			for line in problems:
+				print("  " + line)
+			sys.exit(1)
+		print(f"No regression against {args.compare} (tolerance {args.tolerance:.0%}).")
+
+if __name__ == "__main__":
+	main()
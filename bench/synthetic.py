@@ -0,0 +1,68 @@
+"""
+Synthetic raw datasets with the schema of the Chernobyl CSV.
+
+Rows are drawn from pools of pre-formatted strings so that generating millions of rows stays cheap.
+The isotope columns mix plain readings with the dataset encodings ('<', '<0,01', 'N', 'L', comma
+decimals, padded values) and a fraction of rows is duplicated, like in the real export.
+"""
+import numpy as np
+import pandas as pd
+
+COLUMNS = ["PAYS", "Code", "Location", "Longitude", "Latitude", "Date", "I_131_(Bq/m3)", "Cs_134_(Bq/m3)", "Cs_137_(Bq/m3)"]
+COUNTRIES = ["SE", "DE", "F", "IR", "IT", "NL", "GR", "UK", "BE", "ES", "CH", "AU", "FI", "NO", "CZ", "HU"]
+SPECIAL_VALUES = ["<", "N", "L", "<0,01", "<0.005", " 0.12 ", "0,0046"]
+
+def _value_pool(rng: np.random.Generator, size: int, special_frac: float) -> np.ndarray:
+	"""Formatted isotope readings: log-normal values plus the dataset's special encodings."""
+	values = rng.lognormal(mean=-3.0, sigma=2.0, size=size)
+	pool = np.array([f"{v:.5g}" for v in values], dtype=object)
+	n_special = int(size * special_frac)
+	pool[:n_special] = rng.choice(np.array(SPECIAL_VALUES, dtype=object), size=n_special)
+	return pool
+
+def make_raw(n_rows: int, n_stations: int = None, n_dates: int = None, duplicate_frac: float = 0.01,
+		special_frac: float = 0.1, seed: int = 0) -> pd.DataFrame:
+	"""
+	Return a raw string DataFrame of `n_rows` rows shaped like utils.io.read_raw() output.
+	Rows are sorted by station then date; `duplicate_frac` of them are exact copies of other rows.
+	"""
+	rng = np.random.default_rng(seed)
+	n_stations = n_stations or int(np.clip(n_rows // 25, 10, 5000))
+	n_dates = n_dates or int(np.clip(n_rows // n_stations, 7, 3650))
+	n_unique = n_rows - int(n_rows * duplicate_frac)
+
+	# stations: country, code, name and coordinates over Europe
+	country_idx = rng.integers(len(COUNTRIES), size=n_stations)
+	st_pays = np.array(COUNTRIES, dtype=object)[country_idx]
+	st_code = np.array([str(i + 1) for i in range(len(COUNTRIES))], dtype=object)[country_idx]
+	st_name = np.array([f"STATION_{i:05d}" for i in range(n_stations)], dtype=object)
+	st_lon = np.array([f"{v:.2f}" for v in rng.uniform(-10.0, 35.0, n_stations)], dtype=object)
+	st_lat = np.array([f"{v:.2f}" for v in rng.uniform(35.0, 70.0, n_stations)], dtype=object)
+	dates = pd.date_range("1986-04-26", periods=n_dates, freq="D").strftime("%y/%m/%d").to_numpy(dtype=object)
+
+	station = rng.integers(n_stations, size=n_unique)
+	day = rng.integers(n_dates, size=n_unique)
+	order = np.lexsort((day, station))
+	station, day = station[order], day[order]
+
+	pool = _value_pool(rng, 4096, special_frac)
+	data = {
+		"PAYS": st_pays[station],
+		"Code": st_code[station],
+		"Location": st_name[station],
+		"Longitude": st_lon[station],
+		"Latitude": st_lat[station],
+		"Date": dates[day],
+	}
+	for col in COLUMNS[6:]:
+		data[col] = pool[rng.integers(len(pool), size=n_unique)]
+	df = pd.DataFrame(data, columns=COLUMNS)
+
+	if n_rows > n_unique:
+		dup = rng.integers(n_unique, size=n_rows - n_unique)
+		df = pd.concat([df, df.iloc[dup]], ignore_index=True)
+	return df
+
+def write_csv(path, n_rows: int, **kwargs) -> None:
+	"""Write a synthetic raw dataset of `n_rows` rows to `path` as CSV."""
+	make_raw(n_rows, **kwargs).to_csv(path, index=False)
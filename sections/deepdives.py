@@ -1,9 +1,14 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import pandas as pd
-from typing import Optional
-import pydeck as pdk
+from typing import TYPE_CHECKING, Optional
 
-def render_insights(deck: pdk.Deck, df_filtered: Optional[pd.DataFrame]):
+if TYPE_CHECKING:
+	import altair as alt
+	import pydeck as pdk
+	from utils.spatial import StationIndex
+
+def render_insights(deck: "pdk.Deck", df_filtered: Optional[pd.DataFrame], interpolated: bool = False):
 	"""Render the Insights narrative: show map, diagnostics and allow CSV export."""
 	st.header("Insights — What the data reveals")
 	st.markdown(
@@ -12,12 +17,34 @@ def render_insights(deck: pdk.Deck, df_filtered: Optional[pd.DataFrame]):
 		"- Use the debug expander if no points appear on the map."
 	)
 	st.subheader("Interactive map — Regional view")
-	st.markdown("The date slider in the sidebar selects the date; the map shows stations with valid measurements on that day.")
+	st.markdown("The date range slider in the sidebar selects the period; the map shows each station's mean over that range.")
 	# show deck (can be empty)
 	st.pydeck_chart(deck)
+	if interpolated:
+		st.caption("Shaded area: inverse-distance interpolation of the daily station means, averaged over the range. "
+			"It is an estimate between stations, not a measurement; cells far from every station are left blank.")
 	# export
 	if df_filtered is not None and not df_filtered.empty:
 		csv = df_filtered.to_csv(index=False)
 		st.download_button("Download visible points (CSV)", data=csv, file_name="map_points.csv", mime="text/csv")
 	else:
 		st.info("No points visible to export for the selected date/isotope.")
+
+def render_playback(html: str, height: int = 580):
+	"""Render the client-side date playback (one payload, animated in the browser)."""
+	st.subheader("Date playback")
+	st.markdown("Daily station means over the whole period; play, pause, speed and the day slider run in the browser.")
+	components.html(html, height=height)
+
+def render_distance(distance_chart: "alt.Chart", station_index: "StationIndex"):
+	"""Render concentration vs distance from the plant and the stations within a chosen radius."""
+	st.subheader("Distance from the plant")
+	st.markdown("Each point is one reading in the selected date range, placed by its station's great-circle distance from Chernobyl.")
+	st.altair_chart(distance_chart, use_container_width=True)
+	radius_km = st.slider("Stations within (km of the plant)", min_value=100, max_value=3000, value=1000, step=100,
+		help="Radius around the Chernobyl plant (51.389° N, 30.099° E); stations are listed nearest first.")
+	nearby = station_index.within_km(radius_km)
+	st.caption(f"{len(nearby)} of {len(station_index.stations)} stations within {radius_km} km.")
+	st.dataframe(nearby, hide_index=True, column_config={
+		"distance_km": st.column_config.NumberColumn("Distance (km)", format="%.0f"),
+	})
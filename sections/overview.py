@@ -1,12 +1,16 @@
 import streamlit as st
 import altair as alt
 import pandas as pd
+from typing import Optional
 from utils import viz
 
-def render_analysis(line_chart: alt.Chart, df_map: pd.DataFrame, isotope_cols: list, max_row: pd.Series, decay_display: float, decay_direction: str):
+def render_analysis(line_chart: alt.Chart, top10: pd.DataFrame, max_row: pd.Series, decay_display: float, decay_direction: str,
+		isotope_fits: Optional[pd.DataFrame] = None, station_fits: Optional[pd.DataFrame] = None):
 	"""Render the Analysis narrative: trends + regional breakdown + half-life chart.
+	top10: 'Location' / 'total' ranking for the selected date range (StationPrefixSums.top)
 	decay_display: non-negative percent magnitude for daily change
 	decay_direction: 'increase'|'decrease'|'stable'|'N/A'
+	isotope_fits / station_fits: decay.fit_decay() results per isotope and per station × isotope
 	"""
 	st.header("Analysis — Trends and regional breakdown")
 	st.markdown("Explore temporal evolution of isotopes (chart) and compare regions.")
@@ -20,10 +24,7 @@ def render_analysis(line_chart: alt.Chart, df_map: pd.DataFrame, isotope_cols: l
 	col3.metric("Approx. Daily Change (%)", f"{decay_display:.2f}" if pd.notna(decay_display) else "N/A")
 	col3.caption(f"Avg daily {decay_direction}")
  
-	st.markdown("Regional differences — Top 10 locations by total concentration for the selected date")
-	df_region = df_map.copy()
-	df_region["total"] = df_region[isotope_cols].sum(axis=1)
-	top10 = df_region.groupby("Location")["total"].sum().nlargest(10).reset_index()
+	st.markdown("Regional differences — Top 10 locations by total concentration for the selected date range")
 	bar_region = alt.Chart(top10).mark_bar().encode(
  		x="total:Q",
  		y=alt.Y("Location:N", sort="-x")
@@ -32,4 +33,19 @@ def render_analysis(line_chart: alt.Chart, df_map: pd.DataFrame, isotope_cols: l
  
 	# half-life chart via viz helper
 	st.subheader("Isotopes and their Half-life")
-	st.altair_chart(viz.build_half_life_chart(), use_container_width=True)
+	st.altair_chart(viz.build_half_life_chart(isotope_fits), use_container_width=True)
+	if isotope_fits is not None:
+		st.caption("Fitted values are apparent half-lives of airborne concentrations after each isotope's peak "
+			"(log-linear fit). They mix radioactive decay with plume dispersion, so they are much shorter than the physical half-lives.")
+	if station_fits is not None and not station_fits.empty:
+		with st.expander("Decay fits per station", expanded=False):
+			st.dataframe(
+				station_fits.dropna(subset=["slope_per_day"]).sort_values(["Isotope", "half_life_days"]),
+				hide_index=True,
+				column_config={
+					"slope_per_day": st.column_config.NumberColumn("Slope (log/day)", format="%.4f"),
+					"daily_change_pct": st.column_config.NumberColumn("Daily change (%)", format="%.2f"),
+					"half_life_days": st.column_config.NumberColumn("Half-life (days)", format="%.2f"),
+					"r2": st.column_config.NumberColumn("R²", format="%.2f"),
+				},
+			)
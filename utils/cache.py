@@ -0,0 +1,160 @@
+"""
+Bounded result cache shared by every session of the dashboard process.
+
+The per-parameter results of a rerun (map frames, trend series, rankings, decay fits, ...) are
+memoized here under (function name, arguments), where the arguments start with the data
+fingerprint. Entries are evicted least-recently-used once their estimated size exceeds a memory
+budget (RESULT_CACHE_MB, default 256). Unlike st.cache_data, values are returned as they are, not
+copied per call, so callers must not modify them in place (as with st.cache_resource).
+
+	@cache.memoized("get_map_data")
+	def get_map_data(fingerprint, start, end, isotope):
+		...
+
+Each call runs in a trace span (hit / miss recorded, see utils/trace.py); `RESULTS.stats()` gives
+the hit, miss and eviction counters shown in the diagnostics panel.
+"""
+import functools
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+import numpy as np
+import pandas as pd
+
+from . import trace
+
+DEFAULT_BUDGET_MB = 256.0
+
+def sizeof(value) -> int:
+	"""Estimated memory held by a cached value in bytes (frames and arrays by their buffers)."""
+	if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+		usage = value.memory_usage(deep=True, index=True)
+		return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+	if isinstance(value, np.ndarray):
+		return value.nbytes
+	if isinstance(value, (str, bytes)):
+		return sys.getsizeof(value)
+	if isinstance(value, dict):
+		return sys.getsizeof(value) + sum(sizeof(k) + sizeof(v) for k, v in value.items())
+	if isinstance(value, (tuple, list)):
+		return sys.getsizeof(value) + sum(sizeof(v) for v in value)
+	return sys.getsizeof(value)
+
+class ResultCache:
+	"""
+	Thread-safe LRU mapping of key → value bounded by `max_bytes` (sizes from sizeof()).
+	Concurrent misses on one key compute it once; the other callers wait for that result.
+	"""
+
+	def __init__(self, max_bytes: int):
+		self.max_bytes = int(max_bytes)
+		self._entries = OrderedDict()        # key -> (value, size)
+		self._pending = {}                   # key -> lock held while the value is computed
+		self._lock = threading.Lock()
+		self.bytes = 0
+		self.hits = self.misses = self.evictions = 0
+
+	def __len__(self) -> int:
+		return len(self._entries)
+
+	def _lookup(self, key: Hashable):
+		"""(True, value) on a hit, moved to the most recently used end; (False, None) otherwise."""
+		entry = self._entries.get(key)
+		if entry is None:
+			return False, None
+		self._entries.move_to_end(key)
+		return True, entry[0]
+
+	def get_or_compute(self, key: Hashable, compute: Callable[[], object], on_miss: Optional[Callable[[], None]] = None):
+		"""Cached value of `key`, or compute() stored under it (on_miss() is called first on a miss)."""
+		while True:
+			with self._lock:
+				found, value = self._lookup(key)
+				if found:
+					self.hits += 1
+					return value
+				pending = self._pending.get(key)
+				if pending is None:
+					pending = self._pending[key] = threading.Lock()
+					pending.acquire()
+					self.misses += 1
+					break
+			# another thread is computing this key: wait for it, then look again
+			with pending:
+				pass
+		try:
+			if on_miss is not None:
+				on_miss()
+			value = compute()
+			self.put(key, value)
+			return value
+		finally:
+			with self._lock:
+				del self._pending[key]
+			pending.release()
+
+	def put(self, key: Hashable, value) -> None:
+		"""Store `value`, evicting least-recently-used entries to stay within max_bytes."""
+		size = sizeof(value)
+		with self._lock:
+			old = self._entries.pop(key, None)
+			if old is not None:
+				self.bytes -= old[1]
+			if size > self.max_bytes:
+				# larger than the whole budget: returned to the caller, never kept
+				self.evictions += 1
+				return
+			self._entries[key] = (value, size)
+			self.bytes += size
+			while self.bytes > self.max_bytes:
+				_, (_, evicted) = self._entries.popitem(last=False)
+				self.bytes -= evicted
+				self.evictions += 1
+
+	def clear(self) -> None:
+		with self._lock:
+			self._entries.clear()
+			self.bytes = 0
+
+	def stats(self) -> dict:
+		"""Counters since start: hits, misses, evictions, hit rate, plus current entries and MB."""
+		with self._lock:
+			calls = self.hits + self.misses
+			return {
+				"entries": len(self._entries),
+				"mb": round(self.bytes / 1e6, 2),
+				"budget_mb": round(self.max_bytes / 1e6, 1),
+				"hits": self.hits,
+				"misses": self.misses,
+				"evictions": self.evictions,
+				"hit_rate": round(self.hits / calls, 3) if calls else None,
+			}
+
+def _budget_bytes() -> int:
+	try:
+		return int(float(os.environ.get("RESULT_CACHE_MB", DEFAULT_BUDGET_MB)) * 1e6)
+	except ValueError:
+		return int(DEFAULT_BUDGET_MB * 1e6)
+
+# one cache per process: module state outlives the reruns and is shared by every session
+RESULTS = ResultCache(_budget_bytes())
+
+def memoized(name: str, cache: Optional[ResultCache] = None):
+	"""
+	Decorator caching results in `cache` (default RESULTS) under (name, args, kwargs); the arguments
+	must be hashable. Each call is traced as a span `name` with its cache outcome.
+	"""
+	def decorate(fn):
+		@functools.wraps(fn)
+		def wrapper(*args, **kwargs):
+			target = RESULTS if cache is None else cache
+			key = (name, args, tuple(sorted(kwargs.items())))
+			with trace.span(name, cached=True) as s:
+				result = target.get_or_compute(key, lambda: fn(*args, **kwargs), on_miss=trace.cache_miss)
+				s.rows_out = trace.rows_of(result)
+			return result
+		return wrapper
+	return decorate
@@ -0,0 +1,89 @@
+"""
+Decay analytics: daily rates of change and log-linear half-life fits.
+
+Everything is computed for all groups at once: rows are sorted by group and date, consecutive
+differences are masked at group boundaries, and regressions come from grouped sums instead of a
+Python loop per group.
+"""
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+def isotope_label(col: str) -> str:
+	"""'Cs_137_(Bq/m3)' → 'Cs-137' (labels used by viz.build_half_life_chart)."""
+	return col.split("_(")[0].replace("_", "-")
+
+def daily_log_rates(df: pd.DataFrame, by: str = "Isotope", date: str = "Date", value: str = "Concentration") -> pd.DataFrame:
+	"""
+	Per-interval daily log rates `log(v_i / v_{i-1}) / days` between consecutive positive readings of
+	each `by` group. Intervals of zero days are skipped. Returns columns [by, 'daily_log_rate'].
+	"""
+	d = pd.DataFrame({
+		by: df[by].to_numpy(),
+		"date": pd.to_datetime(df[date], errors="coerce").to_numpy(),
+		"value": pd.to_numeric(df[value], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan),
+	}).dropna()
+	d = d[d["value"] > 0].sort_values([by, "date"], kind="stable")
+	groups = d[by].to_numpy()
+	days = d["date"].to_numpy().astype("datetime64[ns]").astype(np.int64) / 86400e9
+	logs = np.log(d["value"].to_numpy())
+	delta_days = np.diff(days)
+	ok = (groups[1:] == groups[:-1]) & (delta_days > 0)
+	return pd.DataFrame({by: groups[1:][ok], "daily_log_rate": np.diff(logs)[ok] / delta_days[ok]})
+
+def approx_daily_decay_pct(df_time: pd.DataFrame) -> float:
+	"""
+	Estimate average daily percent change across isotopes.
+
+	Median daily log rate per isotope (robust to outliers), averaged across isotopes and converted
+	back to a percent change per day. NaN when no isotope has two positive readings.
+	"""
+	rates = daily_log_rates(df_time)
+	if rates.empty:
+		return float("nan")
+	medians = rates.groupby("Isotope", sort=False)["daily_log_rate"].median()
+	return (np.exp(float(medians.mean())) - 1.0) * 100.0
+
+def fit_decay(df: pd.DataFrame, value_cols: Sequence[str], by: Optional[Sequence[str]] = None,
+		date: str = "Date", from_peak: bool = True, min_points: int = 3) -> pd.DataFrame:
+	"""
+	Log-linear fit `log(value) = a + slope * days` for every (by..., isotope) group of a wide table.
+
+	from_peak: fit only readings on or after each group's maximum (the decay phase).
+	Returns one row per group with 'Isotope', 'n', 'slope_per_day', 'daily_change_pct', 'r2' and
+	'half_life_days' (ln 2 / -slope, NaN when the series does not decrease).
+	"""
+	by = list(by or [])
+	long = df.melt(id_vars=[date] + by, value_vars=list(value_cols), var_name="Isotope", value_name="value")
+	long = long[long["value"] > 0].sort_values(by + ["Isotope", date], kind="stable")
+	keys = by + ["Isotope"]
+	if from_peak:
+		group_id = long.groupby(keys, sort=False, observed=True).ngroup()
+		at_peak = long["value"] == long["value"].groupby(group_id).transform("max")
+		long = long[at_peak.groupby(group_id).cummax()]
+
+	# centered sums: slope = Σ tc·y / Σ tc², r² = (Σ tc·y)² / (Σ tc² · Σ (y - ȳ)²)
+	parts = long[keys].copy()
+	t = (long[date] - long[date].min()).dt.total_seconds() / 86400.0
+	parts["y"] = np.log(long["value"].astype(np.float64))
+	parts["tc"] = t - t.groupby([long[k] for k in keys], sort=False, observed=True).transform("mean")
+	parts["tcy"] = parts["tc"] * parts["y"]
+	parts["tc2"] = parts["tc"] ** 2
+	parts["y2"] = parts["y"] ** 2
+	sums = parts.groupby(keys, sort=False, observed=True).agg(
+		n=("y", "size"), sy=("y", "sum"), sy2=("y2", "sum"), stcy=("tcy", "sum"), stc2=("tc2", "sum"))
+
+	with np.errstate(invalid="ignore", divide="ignore"):
+		slope = sums["stcy"] / sums["stc2"]
+		ss_y = sums["sy2"] - sums["sy"] ** 2 / sums["n"]
+		r2 = sums["stcy"] ** 2 / (sums["stc2"] * ss_y)
+	enough = (sums["n"] >= min_points) & (sums["stc2"] > 0)
+	out = pd.DataFrame({
+		"n": sums["n"],
+		"slope_per_day": slope.where(enough),
+		"r2": r2.where(enough & (ss_y > 1e-12)).clip(upper=1.0),
+	})
+	out["daily_change_pct"] = (np.exp(out["slope_per_day"]) - 1.0) * 100.0
+	out["half_life_days"] = (np.log(2) / -out["slope_per_day"]).where(out["slope_per_day"] < 0)
+	return out.reset_index()
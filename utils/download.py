@@ -1,9 +1,18 @@
 import os
 import json
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import requests
+from typing import TYPE_CHECKING, Optional
 import sys
 
+from .store import file_hash
+
+# requests is imported when a download actually runs, not on every start with a local file
+if TYPE_CHECKING:
+    import requests
+
 ROOT = Path(__file__).resolve().parents[1]
 DATA_DIR = ROOT / "data"
 DATA_DIR.mkdir(exist_ok=True)
@@ -13,6 +22,16 @@ DEFAULT_CANDIDATES = [
     DATA_DIR / "Chernobyl_ Chemical_Radiation.csv",
 ]
 
+CHUNK_SIZE = 1 << 20                       # bytes read per iteration of a response stream
+PARALLEL_MIN_BYTES = 32 * 1024 * 1024      # files this large are fetched as parallel byte ranges
+SEGMENTS = 4                               # number of parallel byte ranges
+RETRIES = 3                                # resumed attempts before giving up (the .part file is kept)
+TIMEOUT = 30
+STATE_EVERY = 8                            # chunks between two saves of the resume state
+
+class RangeNotSupported(Exception):
+    """The server answered a byte-range request with the whole file."""
+
 def _read_seeds():
     seeds_path = ROOT / "seeds.json"
     if seeds_path.exists():
@@ -22,53 +41,234 @@ def _read_seeds():
             return {}
     return {}
 
-def get_data_path() -> Path:
+def _part_path(dest: Path) -> Path:
+    return dest.with_name(dest.name + ".part")
+
+def _state_path(dest: Path) -> Path:
+    """Resume state of an unfinished download: source, validators, size and byte ranges done."""
+    return dest.with_name(dest.name + ".part.json")
+
+def _meta_path(dest: Path) -> Path:
+    """Validators (ETag / Last-Modified) and sha256 of a finished download, for conditional requests."""
+    return dest.with_name(dest.name + ".meta.json")
+
+def _read_json(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+def _write_json(path: Path, data: dict) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _validators(resp: "requests.Response") -> dict:
+    return {"etag": resp.headers.get("ETag"), "last_modified": resp.headers.get("Last-Modified")}
+
+def _content_length(resp: "requests.Response") -> Optional[int]:
+    try:
+        return int(resp.headers["Content-Length"])
+    except (KeyError, ValueError):
+        return None
+
+def _if_range(state: dict) -> dict:
+    """If-Range header so a changed file is sent whole (200) instead of a mismatched range."""
+    value = state.get("etag") or state.get("last_modified")
+    return {"If-Range": value} if value else {}
+
+def _plan(size: Optional[int], accepts_ranges: bool, segments: int) -> list:
+    """Byte ranges [start, end) still to fetch, as mutable [start, end, done] triples."""
+    if size is None or not accepts_ranges or size < PARALLEL_MIN_BYTES or segments <= 1:
+        return [[0, size, 0]]
+    bounds = [size * i // segments for i in range(segments + 1)]
+    return [[bounds[i], bounds[i + 1], 0] for i in range(segments)]
+
+def _save_state(dest: Path, state: dict, lock: threading.Lock) -> None:
+    with lock:
+        _write_json(_state_path(dest), state)
+
+def _write_stream(resp: "requests.Response", dest: Path, segment: list, state: dict, lock: threading.Lock) -> None:
+    """
+    Write a response body at the current offset of `segment`, saving progress every few chunks and
+    when the stream ends or breaks, so a retry resumes from the last byte written.
+    """
+    part = _part_path(dest)
+    with open(part, "r+b") as f:
+        f.seek(segment[0] + segment[2])
+        try:
+            for i, chunk in enumerate(resp.iter_content(chunk_size=CHUNK_SIZE), 1):
+                if segment[1] is not None:
+                    chunk = chunk[: segment[1] - segment[0] - segment[2]]
+                f.write(chunk)
+                segment[2] += len(chunk)
+                if i % STATE_EVERY == 0:
+                    f.flush()
+                    _save_state(dest, state, lock)
+        finally:
+            f.flush()
+            os.fsync(f.fileno())
+            _save_state(dest, state, lock)
+
+def _fetch_segment(url: str, dest: Path, segment: list, state: dict, lock: threading.Lock) -> None:
+    """Fetch the rest of one byte range; a whole-file answer is only accepted for a fresh single range."""
+    import requests
+
+    start, end, done = segment
+    if end is not None and start + done >= end:
+        return
+    headers = {}
+    if start + done > 0 or end is not None and len(state["segments"]) > 1:
+        last = "" if end is None else str(end - 1)
+        headers = {"Range": f"bytes={start + done}-{last}", **_if_range(state)}
+    with requests.get(url, stream=True, timeout=TIMEOUT, headers=headers) as resp:
+        resp.raise_for_status()
+        if headers and resp.status_code != 206:
+            # Range ignored (e.g. python -m http.server) or file changed since the state was saved
+            raise RangeNotSupported(url)
+        _write_stream(resp, dest, segment, state, lock)
+
+def _new_state(url: str, resp: "requests.Response", segments: int) -> dict:
+    size = _content_length(resp) if "Content-Encoding" not in resp.headers else None
+    accepts_ranges = resp.headers.get("Accept-Ranges", "").lower() == "bytes"
+    return {"url": url, **_validators(resp), "size": size, "segments": _plan(size, accepts_ranges, segments)}
+
+def _resumable(state: dict, url: str, resp: "requests.Response", part: Path) -> bool:
+    """True when a saved state belongs to this URL and the server still reports the same file."""
+    if not state or state.get("url") != url or not part.exists():
+        return False
+    current = _validators(resp)
+    same = any(state.get(k) and state.get(k) == current[k] for k in ("etag", "last_modified"))
+    return same and state.get("size") == _content_length(resp)
+
+def download(url: str, dest: Path, sha256: Optional[str] = None, segments: int = SEGMENTS, force: bool = False) -> bool:
+    """
+    Download `url` to `dest` and return True, or return False when the server reports that the
+    copy recorded in the `.meta.json` sidecar is unchanged (304 to If-None-Match / If-Modified-Since).
+
+    Data goes to `<dest>.part` and is renamed onto `dest` only once it is complete and matches
+    `sha256` (when given), so `dest` is never partial. Large files are fetched as `segments` parallel
+    byte ranges when the server accepts ranges. An interrupted download resumes from the ranges
+    recorded in `<dest>.part.json`; servers ignoring Range get a plain full download instead.
+    """
+    import requests
+
+    dest = Path(dest)
+    part, state_path, meta_path = _part_path(dest), _state_path(dest), _meta_path(dest)
+    meta = _read_json(meta_path) if dest.exists() and not force else {}
+    conditional = {}
+    if meta.get("url") == url:
+        if meta.get("etag"):
+            conditional["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            conditional["If-Modified-Since"] = meta["last_modified"]
+
+    lock = threading.Lock()
+    attempt = 0
+    while True:
+        try:
+            probe = requests.get(url, stream=True, timeout=TIMEOUT, headers=conditional)
+            if probe.status_code == 304:
+                probe.close()
+                print(f"{dest.name} is up to date ({url}).")
+                return False
+            probe.raise_for_status()
+            state = _read_json(state_path)
+            if not _resumable(state, url, probe, part):
+                state = _new_state(url, probe, segments)
+                with open(part, "wb") as f:
+                    if state["size"]:
+                        f.truncate(state["size"])
+                _save_state(dest, state, lock)
+            remaining = [s for s in state["segments"] if s[1] is None or s[0] + s[2] < s[1]]
+            if len(state["segments"]) == 1 and state["segments"][0][2] == 0:
+                # fresh single stream: the probe response already carries the body
+                with probe:
+                    _write_stream(probe, dest, state["segments"][0], state, lock)
+            else:
+                probe.close()
+                done = sum(s[2] for s in state["segments"])
+                print(f"Downloading {url}: {len(remaining)} range(s), {done} bytes already on disk ...")
+                with ThreadPoolExecutor(max_workers=max(1, len(remaining))) as pool:
+                    for future in [pool.submit(_fetch_segment, url, dest, s, state, lock) for s in remaining]:
+                        future.result()
+            break
+        except RangeNotSupported:
+            # the next attempt starts over as one plain stream, which never sends a Range header
+            print(f"{url} does not honour byte ranges, restarting as a single stream.")
+            state_path.unlink(missing_ok=True)
+            segments = 1
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            attempt += 1
+            if attempt >= RETRIES:
+                raise RuntimeError(f"Failed to download data from {url} after {RETRIES} attempts: {e} "
+                                   f"(partial data kept in {part.name}, the next run resumes it)") from e
+            print(f"Download interrupted ({e}), resuming ({attempt}/{RETRIES}) ...")
+
+    size = state.get("size")
+    if size is not None and part.stat().st_size != size:
+        raise RuntimeError(f"Incomplete download of {url}: {part.stat().st_size} of {size} bytes")
+    digest = _sha256(part)
+    if sha256 and digest != sha256.lower():
+        part.unlink(missing_ok=True)
+        state_path.unlink(missing_ok=True)
+        raise RuntimeError(f"Checksum mismatch for {url}: expected sha256 {sha256}, got {digest}")
+    os.replace(part, dest)
+    _write_json(meta_path, {"url": url, "etag": state.get("etag"), "last_modified": state.get("last_modified"),
+                            "size": dest.stat().st_size, "sha256": digest})
+    state_path.unlink(missing_ok=True)
+    print("Download finished.")
+    return True
+
+def get_data_path(refresh: bool = False) -> Path:
     """
     Return path to cached CSV. If not present, try to download from:
     1) environment variable DATA_URL
     2) seeds.json['data_url']
     If no URL is provided and no local file exists, raise FileNotFoundError with instructions.
+
+    When seeds.json declares 'data_sha256', a local file that does not match it is downloaded again
+    (or rejected when there is no URL). refresh=True revalidates an existing download with a
+    conditional request and fetches it again only if the server copy changed.
     """
-    # 1) if a candidate local file exists, return it
-    for p in DEFAULT_CANDIDATES:
-        if p.exists():
-            return p
+    seeds = _read_seeds()
+    url = os.environ.get("DATA_URL") or seeds.get("data_url") or ""
+    expected = (seeds.get("data_sha256") or "").strip().lower() or None
+    filename = seeds.get("download_filename", "Chernobyl_Chemical_Radiation.csv")
+    dest = DATA_DIR / filename
+
+    # 1) if a local file exists (downloads are renamed into place only once complete), return it
+    local = next((p for p in [dest] + DEFAULT_CANDIDATES if p.exists()), None)
+    mismatch = local is not None and expected is not None and file_hash(local) != expected
+    if local is not None and not mismatch and not (refresh and url):
+        return local
+    if mismatch and not url:
+        raise RuntimeError(f"{local} does not match the sha256 declared in seeds.json ('data_sha256').")
 
     # 2) get URL from env or seeds.json
-    url = os.environ.get("DATA_URL") or _read_seeds().get("data_url") or ""
     if not url:
         raise FileNotFoundError(
             "Data file not found in data/. Set DATA_URL env var or fill seeds.json 'data_url', or place the CSV in the data/ folder."
         )
 
-    # determine destination filename
-    seeds = _read_seeds()
-    filename = seeds.get("download_filename", "Chernobyl_Chemical_Radiation.csv")
-    dest = DATA_DIR / filename
-
-    # if already downloaded (maybe incomplete), do not redownload
-    if dest.exists():
-        return dest
-
-    # attempt download
-    print(f"Downloading data from {url} to {dest} ...")
-    try:
-        resp = requests.get(url, stream=True, timeout=30)
-        resp.raise_for_status()
-        with open(dest, "wb") as f:
-            for chunk in resp.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-        print("Download finished.")
-        return dest
-    except Exception as e:
-        if dest.exists():
-            return dest
-        raise RuntimeError(f"Failed to download data from {url}: {e}") from e
+    # attempt download (conditional when the sidecar of a previous download is present)
+    if mismatch:
+        print(f"{local.name} does not match the declared sha256, downloading it again ...")
+    else:
+        print(f"Downloading data from {url} to {dest} ...")
+    download(url, dest, sha256=expected, force=mismatch)
+    return dest
 
 if __name__ == "__main__":
     try:
-        p = get_data_path()
+        p = get_data_path(refresh=True)
         print(f"Using data file: {p}")
     except Exception as exc:
         print("Error:", exc, file=sys.stderr)
@@ -0,0 +1,54 @@
+"""
+Date-partitioned row index over the clean table.
+
+Rows are sorted once by calendar day and an offsets array marks where each day starts, so the rows
+of one day (or of a contiguous run of days) are a positional slice of the sorted frame: no scan, no
+per-row date objects and no copy.
+"""
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+
+class DateIndex:
+	"""Rows of `df` sorted by day, with `offsets[i]:offsets[i + 1]` spanning the rows of `days[i]`."""
+
+	def __init__(self, df: pd.DataFrame, date_col: str = "Date"):
+		day = df[date_col].dt.floor("D")
+		valid = day.notna().to_numpy()
+		day_ns = day.to_numpy()[valid].astype("datetime64[D]")
+		order = np.argsort(day_ns, kind="stable")
+		self.frame = df[valid].iloc[order]
+		sorted_days = day_ns[order]
+		self.days = np.unique(sorted_days)
+		self.offsets = np.append(np.searchsorted(sorted_days, self.days, side="left"), len(sorted_days))
+		self._position = {d: i for i, d in enumerate(self.days.astype(dt.date))}
+
+	def __len__(self) -> int:
+		return len(self.days)
+
+	@property
+	def first_day(self) -> dt.date:
+		return self.days[0].astype(dt.date)
+
+	@property
+	def last_day(self) -> dt.date:
+		return self.days[-1].astype(dt.date)
+
+	def rows(self, day: dt.date) -> pd.DataFrame:
+		"""Rows measured on `day` (an empty frame if there are none)."""
+		i = self._position.get(day)
+		if i is None:
+			return self.frame.iloc[0:0]
+		return self.frame.iloc[self.offsets[i]:self.offsets[i + 1]]
+
+	def span(self, start: dt.date, end: dt.date) -> tuple:
+		"""Positions (i, j) of the days in [start, end]: days[i:j], rows offsets[i]:offsets[j]."""
+		i = int(np.searchsorted(self.days, np.datetime64(start, "D"), side="left"))
+		j = int(np.searchsorted(self.days, np.datetime64(end, "D"), side="right"))
+		return i, max(i, j)
+
+	def rows_between(self, start: dt.date, end: dt.date) -> pd.DataFrame:
+		"""Rows measured between `start` and `end` inclusive, as one contiguous slice."""
+		i, j = self.span(start, end)
+		return self.frame.iloc[self.offsets[i]:self.offsets[j]]
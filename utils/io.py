@@ -1,13 +1,68 @@
+from typing import Optional
+
 import pandas as pd
-import streamlit as st
-from . import download
+from . import download, sources, store, trace
+from .prep import PIPELINE_VERSION, make_tables, make_tables_streaming, with_derived_tables
+from .schema import READ_DTYPES
+
+# CSVs larger than this are cleaned chunk by chunk instead of being read whole
+STREAMING_MIN_BYTES = 256 * 1024 * 1024
+
+def read_raw(path) -> pd.DataFrame:
+	"""Read the source CSV: station columns as categories, the others as strings until cleaned."""
+	return pd.read_csv(path, dtype=READ_DTYPES)
+
+# fingerprint → dataset_key of the sources.json dataset last seen by data_fingerprint
+_source_keys = {}
+
+def data_fingerprint() -> str:
+	"""
+	Identifier of the current dataset content + pipeline version, used to key memoized results.
+	Sources of sources.json are only read locally (see sources.dataset_key), never downloaded here.
+	"""
+	manifest = sources.read_manifest()
+	if manifest:
+		key = sources.dataset_key(manifest)
+		fingerprint = f"{sources.key_digest(key)[:16]}-v{PIPELINE_VERSION}"
+		_source_keys.clear()
+		_source_keys[fingerprint] = key
+		return fingerprint
+	path = download.get_data_path()
+	return f"{store.file_hash(path)[:16]}-v{PIPELINE_VERSION}"
+
+def table_cache():
+	"""(path anchoring the table cache, key of the current tables): the CSV, or the merged sources of sources.json."""
+	manifest = sources.read_manifest()
+	if manifest:
+		return sources.ANCHOR, sources.dataset_key(manifest)
+	path = download.get_data_path()
+	return path, store.cache_key(path, PIPELINE_VERSION)
 
-@st.cache_data(show_spinner=True)
-def load_data():
-	"""Load the raw dataset (from cache or by downloading)."""
+def load_tables(fingerprint: Optional[str] = None):
+	"""
+	Return the derived tables (a LazyTables), memory-mapped from the columnar cache next to the CSV when it matches
+	the CSV content hash and PIPELINE_VERSION, otherwise rebuilt with make_tables() and re-cached.
+	Large CSVs (see STREAMING_MIN_BYTES) go through make_tables_streaming() so the raw string frame
+	never has to fit in memory. Traced as 'load_tables' (cache: hit = columnar cache, miss = rebuild).
+	When sources.json lists sources, they are merged instead (utils/sources.py); passing the
+	`fingerprint` of data_fingerprint() reuses the dataset key computed for it.
+	"""
+	manifest = sources.read_manifest()
+	if manifest:
+		return with_derived_tables(sources.load_tables(manifest, key=_source_keys.get(fingerprint)))
 	path = download.get_data_path()
-	df = pd.read_csv(path, dtype=str)
-	return df
+	def build():
+		trace.cache_miss()
+		if path.stat().st_size >= STREAMING_MIN_BYTES:
+			return make_tables_streaming(path)
+		with trace.span("read_raw") as s:
+			df_raw = read_raw(path)
+			s.rows_out = len(df_raw)
+		return make_tables(df_raw)
+	with trace.span("load_tables", cached=True) as s:
+		tables = store.load_or_build(path, build, PIPELINE_VERSION)
+		s.rows_out = trace.rows_of(tables)
+	return with_derived_tables(tables)
 
 
 """
@@ -0,0 +1,153 @@
+"""
+Client-side date playback of the map.
+
+Every (day, station) mean of an isotope is packed once into a compact columnar payload (station
+coordinates once, then parallel day / station / value arrays) and embedded in a small deck.gl page
+(deck.gl from its CDN, run by st.components.v1.html). The page filters the points by day on the GPU
+(DataFilterExtension), so play / pause, speed and scrubbing never go back to the server: the whole
+animation costs one payload instead of a rerun per frame.
+"""
+import json
+
+import numpy as np
+
+from .prefix import StationPrefixSums
+from .spatial import valid_coords
+
+# exact release, from the 9.3 line pydeck 0.9.3 renders with (pydeck.frontend_semver): a new deck.gl
+# release cannot change the page without a change here
+DECK_GL_VERSION = "9.3.0"
+DECK_GL_URL = f"https://unpkg.com/deck.gl@{DECK_GL_VERSION}/dist.min.js"
+BASEMAP_TILES = "https://basemaps.cartocdn.com/light_all/{z}/{x}/{y}.png"
+# same colors as viz.build_deck
+COLORS = {
+	"I_131_(Bq/m3)": [255, 0, 0],
+	"Cs_134_(Bq/m3)": [0, 255, 0],
+	"Cs_137_(Bq/m3)": [0, 0, 255],
+}
+SPEEDS = (1, 2, 4, 8)
+
+def playback_payload(engine: StationPrefixSums, value_col: str, decimals: int = 4) -> dict:
+	"""
+	Daily station means of `value_col` as parallel arrays: `days` (ISO dates), per-station `names`,
+	`lon`, `lat`, and one entry per measured (day, station) in `t` (day position), `s` (station
+	position) and `v` (value). Stations without valid coordinates are left out.
+	"""
+	k = engine.value_cols.index(value_col)
+	sums = np.diff(engine.sums[:, :, k], axis=0)
+	counts = np.diff(engine.counts[:, :, k], axis=0)
+	keep = valid_coords(engine.latitude, engine.longitude)
+	counts[:, ~keep] = 0
+	t, s = np.nonzero(counts)
+	values = sums[t, s] / counts[t, s]
+	# stations renumbered so the payload only lists the ones that appear
+	used, s = np.unique(s, return_inverse=True)
+	return {
+		"days": [str(d) for d in engine.index.days],
+		"names": [str(name) for name in engine.stations[used]],
+		"lon": np.round(engine.longitude[used].astype(np.float64), 4).tolist(),
+		"lat": np.round(engine.latitude[used].astype(np.float64), 4).tolist(),
+		"t": t.tolist(),
+		"s": s.tolist(),
+		"v": np.round(values, decimals).tolist(),
+	}
+
+_TEMPLATE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8">
+<script src="__DECK_GL_URL__"></script>
+<style>
+	body { margin: 0; font-family: sans-serif; font-size: 14px; }
+	#map { position: relative; width: 100%; height: __MAP_HEIGHT__px; }
+	#controls { display: flex; gap: 8px; align-items: center; padding: 6px 0; }
+	#day { flex: 1; }
+	#label { min-width: 90px; font-variant-numeric: tabular-nums; }
+</style></head>
+<body>
+<div id="controls">
+	<button id="play">▶ Play</button>
+	<select id="speed">__SPEED_OPTIONS__</select>
+	<input id="day" type="range" min="0" value="0" step="1">
+	<span id="label"></span>
+</div>
+<div id="map"></div>
+<script>
+const P = __PAYLOAD__;
+const COLOR = __COLOR__;
+const points = P.t.map((t, i) => ({t: t, s: P.s[i], v: P.v[i]}));
+const vmax = P.v.reduce((m, v) => v > m ? v : m, 1e-9);
+const slider = document.getElementById("day"), label = document.getElementById("label");
+const button = document.getElementById("play"), speed = document.getElementById("speed");
+slider.max = Math.max(0, P.days.length - 1);
+let day = 0, timer = null;
+
+function layers() {
+	return [
+		new deck.TileLayer({
+			id: "basemap", data: "__BASEMAP_TILES__", minZoom: 0, maxZoom: 19, tileSize: 256,
+			renderSubLayers: props => {
+				const {west, south, east, north} = props.tile.bbox;
+				return new deck.BitmapLayer(props, {data: null, image: props.data, bounds: [west, south, east, north]});
+			}
+		}),
+		new deck.ScatterplotLayer({
+			id: "readings", data: points, pickable: true, radiusUnits: "pixels",
+			getPosition: d => [P.lon[d.s], P.lat[d.s]],
+			getRadius: d => 3 + 27 * Math.sqrt(Math.max(d.v, 0) / vmax),
+			getFillColor: COLOR.concat([180]),
+			getFilterValue: d => d.t,
+			filterRange: [day, day],
+			extensions: [new deck.DataFilterExtension({filterSize: 1})]
+		})
+	];
+}
+
+const map = new deck.DeckGL({
+	container: "map",
+	initialViewState: {latitude: __LAT__, longitude: __LON__, zoom: __ZOOM__},
+	controller: true,
+	getTooltip: ({object}) => object && `${P.names[object.s]}\\n${P.days[object.t]}: ${object.v} Bq/m³`,
+	layers: layers()
+});
+
+function show(next) {
+	day = next;
+	slider.value = day;
+	label.textContent = P.days[day] || "";
+	map.setProps({layers: layers()});
+}
+function stop() { clearInterval(timer); timer = null; button.textContent = "▶ Play"; }
+function start() {
+	if (day >= P.days.length - 1) show(0);
+	button.textContent = "❚❚ Pause";
+	timer = setInterval(() => { if (day >= P.days.length - 1) stop(); else show(day + 1); }, 1000 / Number(speed.value));
+}
+button.onclick = () => timer ? stop() : start();
+speed.onchange = () => { if (timer) { stop(); start(); } };
+slider.oninput = () => { stop(); show(Number(slider.value)); };
+show(0);
+</script>
+</body></html>
+"""
+
+def playback_html(payload: dict, value_col: str, center=(51.0, 30.0), zoom: int = 4, height: int = 520) -> str:
+	"""Self-contained page animating `payload` (see playback_payload) day by day on a deck.gl map."""
+	lat = float(np.mean(payload["lat"])) if payload["lat"] else center[0]
+	lon = float(np.mean(payload["lon"])) if payload["lon"] else center[1]
+	# "</" would end the <script> element early
+	data = json.dumps(payload, separators=(",", ":")).replace("</", "<\\/")
+	options = "".join(f'<option value="{s}">{s} day{"s" if s > 1 else ""}/s</option>' for s in SPEEDS)
+	replacements = {
+		"__DECK_GL_URL__": DECK_GL_URL,
+		"__BASEMAP_TILES__": BASEMAP_TILES,
+		"__MAP_HEIGHT__": str(height),
+		"__SPEED_OPTIONS__": options,
+		"__COLOR__": json.dumps(COLORS.get(value_col, [0, 0, 0])),
+		"__LAT__": f"{lat:.4f}",
+		"__LON__": f"{lon:.4f}",
+		"__ZOOM__": str(int(zoom)),
+		"__PAYLOAD__": data,       # last: the data itself is never scanned for markers
+	}
+	html = _TEMPLATE
+	for marker, value in replacements.items():
+		html = html.replace(marker, value)
+	return html
@@ -0,0 +1,89 @@
+"""
+Prefix-sum engine for date-range aggregations per station.
+
+Cumulative sums and counts of every isotope are stored per station over the sorted day axis of a
+DateIndex, so the total, mean or top-N ranking of any date range is two array lookups
+(`cum[j] - cum[i]`) instead of a groupby over the rows of the range.
+"""
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+
+from . import qc
+from .index import DateIndex
+from .schema import ISOTOPE_COLS
+
+class StationPrefixSums:
+	"""
+	`sums[d, s, k]` / `counts[d, s, k]`: sum / number of non-missing values of `value_cols[k]` for
+	station `stations[s]` over the first `d` days of `index.days`. Readings carrying any of the
+	`exclude` QC bits (utils/qc.py) are left out, without copying the frame.
+	"""
+
+	def __init__(self, index: DateIndex, value_cols=ISOTOPE_COLS, station_col: str = "Location", exclude: int = 0):
+		self.index = index
+		self.value_cols = list(value_cols)
+		frame = index.frame
+		stations = frame[station_col].astype("category")
+		self.stations = stations.cat.categories
+		codes = stations.cat.codes.to_numpy()
+		n_days, n_stations = len(index.days), len(self.stations)
+
+		# frame is sorted by day: day position of each row straight from the offsets
+		day_pos = np.repeat(np.arange(n_days), np.diff(index.offsets))
+		has_station = codes >= 0
+		cell = day_pos[has_station] * n_stations + codes[has_station]
+
+		self.sums = np.zeros((n_days + 1, n_stations, len(self.value_cols)))
+		self.counts = np.zeros((n_days + 1, n_stations, len(self.value_cols)), dtype=np.int32)
+		for k, col in enumerate(self.value_cols):
+			values = frame[col].to_numpy(dtype=np.float64, na_value=np.nan)[has_station]
+			ok = ~np.isnan(values)
+			if exclude:
+				ok &= ~qc.hidden(frame, col, exclude)[has_station]
+			self.sums[1:, :, k] = np.bincount(cell[ok], weights=values[ok], minlength=n_days * n_stations).reshape(n_days, n_stations)
+			self.counts[1:, :, k] = np.bincount(cell[ok], minlength=n_days * n_stations).reshape(n_days, n_stations)
+		np.cumsum(self.sums, axis=0, out=self.sums)
+		np.cumsum(self.counts, axis=0, out=self.counts)
+
+		# one position per station (first reported coordinates)
+		coords = frame.loc[has_station, ["Latitude", "Longitude"]].groupby(codes[has_station]).first()
+		coords = coords.reindex(np.arange(n_stations))
+		self.latitude = coords["Latitude"].to_numpy()
+		self.longitude = coords["Longitude"].to_numpy()
+
+	def totals(self, start: dt.date, end: dt.date):
+		"""(sums, counts) of shape (n_stations, n_values) over the days in [start, end]."""
+		i, j = self.index.span(start, end)
+		return self.sums[j] - self.sums[i], self.counts[j] - self.counts[i]
+
+	def station_frame(self, start: dt.date, end: dt.date, stat: str = "mean") -> pd.DataFrame:
+		"""
+		One row per station measured in [start, end]: Location, Latitude, Longitude, each value
+		column aggregated with `stat` ('mean' or 'sum') and 'Count', the number of readings.
+		"""
+		sums, counts = self.totals(start, end)
+		if stat == "mean":
+			with np.errstate(invalid="ignore", divide="ignore"):
+				values = sums / counts
+		elif stat == "sum":
+			values = np.where(counts > 0, sums, np.nan)
+		else:
+			raise ValueError(f"Unknown stat: {stat!r}")
+		df = pd.DataFrame({"Location": self.stations, "Latitude": self.latitude, "Longitude": self.longitude})
+		for k, col in enumerate(self.value_cols):
+			df[col] = values[:, k].astype(np.float32)
+		df["Count"] = counts.max(axis=1)
+		return df[df["Count"] > 0].reset_index(drop=True)
+
+	def top(self, start: dt.date, end: dt.date, n: int = 10) -> pd.DataFrame:
+		"""Top `n` stations by total concentration (all value columns summed) over [start, end]."""
+		sums, counts = self.totals(start, end)
+		measured = np.flatnonzero(counts.any(axis=1))
+		total = sums[measured].sum(axis=1)
+		if len(measured) > n:
+			keep = np.argpartition(-total, n - 1)[:n]
+			measured, total = measured[keep], total[keep]
+		order = np.argsort(-total, kind="stable")
+		return pd.DataFrame({"Location": self.stations[measured[order]], "total": total[order]})
@@ -1,70 +1,274 @@
+import numpy as np
 import pandas as pd
-from sklearn.preprocessing import MinMaxScaler
+import pyarrow as pa
+import pyarrow.compute as pc
+from . import qc, trace
+from .schema import ISOTOPE_COLS, READ_DTYPES, SCHEMA, apply_schema
+from .tables import LazyTables
 
-def make_tables(df_raw: pd.DataFrame):
+# Bump whenever make_tables() output changes, so cached tables (utils/store.py) get rebuilt
+PIPELINE_VERSION = "4"
+
+# Colonnes typées dès le nettoyage ; les isotopes restent en float64 jusqu'aux moyennes dérivées
+_CLEAN_SCHEMA = {col: dtype for col, dtype in SCHEMA.items() if col not in ISOTOPE_COLS}
+
+# Format des dates du CSV d'origine (année/mois/jour sur deux chiffres)
+DATE_FORMAT = "%y/%m/%d"
+
+# Valeur purement numérique (après virgule → point) : conversion directe sans regex d'extraction
+_PLAIN_NUMBER = r"^\d+(?:\.\d+)?$"
+# Premier nombre de la chaîne, comme l'ancien .str.extract(r"(\d+\.\d+|\d+)")
+_FIRST_NUMBER = r"(?P<value>\d+\.\d+|\d+)"
+
+def _arrow_strings(values: pd.Series) -> pa.Array:
+    """Return a pyarrow string array for an object column (NaN → null)."""
+    return pa.array(values.to_numpy(dtype=object), type=pa.string(), from_pandas=True)
+
+def strip_strings(values: pd.Series) -> pd.Series:
+    """Vectorized str.strip() of a string column; returns the column untouched when nothing changes."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # seules les catégories sont nettoyées, pas chaque ligne
+        categories = values.cat.categories
+        stripped = pd.Index(strip_strings(categories.to_series()).to_numpy())
+        if stripped.equals(categories):
+            return values
+        if stripped.is_unique:
+            return values.cat.rename_categories(stripped)
+        return values.map(dict(zip(categories, stripped))).astype("category")
+    arr = _arrow_strings(values)
+    trimmed = pc.utf8_trim_whitespace(arr)
+    if arr.equals(trimmed):
+        return values
+    out = trimmed.to_numpy(zero_copy_only=False)
+    # garder les valeurs manquantes d'origine (NaN) plutôt que None
+    missing = pc.is_null(arr).to_numpy(zero_copy_only=False)
+    out[missing] = values.to_numpy(dtype=object)[missing]
+    return pd.Series(out, index=values.index, name=values.name)
+
+def parse_measurement(values: pd.Series) -> pd.Series:
     """
-    Clean and prepare derived tables from the raw dataframe.
+    Parse an isotope column to float, column-wise (pyarrow compute kernels).
+
+    Handles the dataset encodings: comma decimals ('0,5' → 0.5), detection-limit prefixes
+    ('<0.01' → 0.01) and non-numeric codes ('N', 'L', bare '<' → NaN). Anything else falls back to
+    the first number found in the string, so the output matches the historical regex extraction.
     """
+    arr = pc.utf8_trim_whitespace(_arrow_strings(values))
+    arr = pc.replace_substring(arr, ",", ".")  # remplace virgules par points
+    arr = pc.utf8_ltrim(arr, "<")               # limite de détection : garder la valeur
+    out = np.full(len(arr), np.nan)
+    present = pc.is_valid(arr).to_numpy(zero_copy_only=False)
+    plain = pc.fill_null(pc.match_substring_regex(arr, _PLAIN_NUMBER), False).to_numpy(zero_copy_only=False)
+    if plain.any():
+        out[plain] = pc.cast(arr.filter(plain), pa.float64()).to_numpy(zero_copy_only=False)
+    rest = present & ~plain
+    if rest.any():
+        # chiffres non ASCII : seul le moteur re de Python les reconnaît comme \d
+        ascii_only = pc.fill_null(pc.string_is_ascii(arr), True).to_numpy(zero_copy_only=False)
+        fast = rest & ascii_only
+        if fast.any():
+            found = pc.struct_field(pc.extract_regex(arr.filter(fast), _FIRST_NUMBER), [0])
+            out[fast] = pc.cast(found, pa.float64()).to_numpy(zero_copy_only=False)
+        slow = rest & ~ascii_only
+        if slow.any():
+            found = pd.Series(arr.filter(slow).to_numpy(zero_copy_only=False)).str.extract(_FIRST_NUMBER)["value"]
+            out[slow] = found.astype(float).to_numpy()
+    return pd.Series(out, index=values.index, name=values.name)
 
-    df = df_raw.copy()
+def clean_frame(df: pd.DataFrame, date_format: str = DATE_FORMAT) -> pd.DataFrame:
+    """
+    Strip strings and convert Date / isotope columns (steps 1 and 2 of make_tables).
+    `date_format` is any pandas to_datetime format ('ISO8601' and 'mixed' included).
+    """
 
     # --- 1️⃣ Nettoyage de base ---
     # Supprimer les espaces ou caractères invisibles
+    # (les isotopes sont nettoyés par parse_measurement)
     df.columns = df.columns.str.strip()
-    df = df.applymap(lambda x: x.strip() if isinstance(x, str) else x)
+    for col in df.columns.difference(ISOTOPE_COLS, sort=False):
+        if df[col].dtype == object or isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = strip_strings(df[col])
 
     # --- 2️⃣ Conversion des types ---
     # Convertir la colonne "Date" en datetime (format année/mois/jour)
-    df["Date"] = pd.to_datetime(df["Date"], format="%y/%m/%d", errors="coerce")
-
-    # Convertir les isotopes en numérique
-    isotope_cols = ["I_131_(Bq/m3)", "Cs_134_(Bq/m3)", "Cs_137_(Bq/m3)"]
-    for col in isotope_cols:
-        df[col] = (
-            df[col]
-            .astype(str)
-            .str.replace(",", ".")              # remplace virgules par points
-            .str.extract(r"(\d+\.\d+|\d+)")[0]  # extrait les nombres
-            .astype(float)
-        )
+    df["Date"] = pd.to_datetime(df["Date"], format=date_format, errors="coerce")
 
-    # --- 3️⃣ Nettoyage des doublons ---
-    df = df.drop_duplicates()
+    # Convertir les isotopes en numérique, en gardant le statut de lecture dans '<isotope>_qc'
+    for col in ISOTOPE_COLS:
+        parsed = parse_measurement(df[col])
+        df[qc.flag_col(col)] = qc.parse_flags(df[col], parsed)
+        df[col] = parsed
 
-    # --- 4️⃣ Gestion des valeurs manquantes ---
-    # Comptage avant remplissage
-    missing_before = df[isotope_cols].isna().sum()
+    # Types compacts (catégories, Int16, float32) pour les autres colonnes
+    return apply_schema(df, _CLEAN_SCHEMA)
 
-    # Option 1 : remplacer les valeurs manquantes par la moyenne par région
-    if "Location" in df.columns:
-        df[isotope_cols] = df.groupby("Location")[isotope_cols].transform(lambda x: x.fillna(x.mean()))
-    # Option 2 : s'il reste des NaN → remplacer par la moyenne globale
-    df[isotope_cols] = df[isotope_cols].fillna(df[isotope_cols].mean())
+def _print_summary(n_rows: int, missing: pd.Series):
+    print("✅ Dataset nettoyé :")
+    print(f"   → {n_rows} lignes après suppression des doublons")
+    print(f"   → valeurs manquantes (laissées vides, drapeau 'not measured') :")
+    print(missing.rename("manquantes").to_frame())
 
-    # Comptage après remplissage
-    missing_after = df[isotope_cols].isna().sum()
+def _normalized(df: pd.DataFrame) -> pd.DataFrame:
+    """Clean table plus '<isotope>_norm' columns scaled to [0, 1] (scikit-learn is imported on first use)."""
+    from sklearn.preprocessing import MinMaxScaler
 
     # --- 5️⃣ Normalisation des isotopes ---
     scaler = MinMaxScaler()
     df_norm = df.copy()
-    df_norm[[f"{col}_norm" for col in isotope_cols]] = scaler.fit_transform(df[isotope_cols])
+    df_norm[[f"{col}_norm" for col in ISOTOPE_COLS]] = scaler.fit_transform(df[ISOTOPE_COLS]).astype(np.float32)
+    return df_norm
 
-    # --- 6️⃣ Conversion finale en int pour les colonnes originales ---
-    df[isotope_cols] = df[isotope_cols].round().astype(int)
+def _geo(df: pd.DataFrame) -> pd.DataFrame:
+    return df[["Latitude", "Longitude", "Location"] + ISOTOPE_COLS]
 
-    # --- 7️⃣ Résumé du nettoyage ---
-    print("✅ Dataset nettoyé :")
-    print(f"   → {len(df)} lignes après suppression des doublons")
-    print(f"   → valeurs manquantes (avant/après) :")
-    print(pd.DataFrame({"avant": missing_before, "après": missing_after}))
+# --- 8️⃣ Tables dérivées, calculées au premier accès : nom -> (dépendances, fonction) ---
+DERIVED_TABLES = {
+    "normalized": (("clean",), _normalized),    # version normalisée
+    "geo": (("clean",), _geo),
+}
 
-    # --- 8️⃣ Tables dérivées ---
+def with_derived_tables(tables) -> LazyTables:
+    """`tables` (clean / timeseries / by_region, e.g. from the cache) plus the DERIVED_TABLES, built on first access."""
+    if not isinstance(tables, LazyTables):
+        tables = LazyTables.from_frames(tables)
+    return tables.derive(DERIVED_TABLES)
+
+def _derived_tables(df: pd.DataFrame, timeseries: pd.DataFrame, by_region: pd.DataFrame) -> LazyTables:
+    """Assemble the tables from the clean frame and its aggregates."""
+    # --- 6️⃣ Types compacts pour toutes les tables (float32, sans arrondi des mesures) ---
     tables = {
         "clean": df,                       # dataset propre
-        "normalized": df_norm,             # version normalisée
-        "timeseries": df.groupby("Date")[isotope_cols].mean().reset_index(),
-        "by_region": df.groupby("Location")[isotope_cols].mean().reset_index(),
-        "geo": df[["Latitude", "Longitude", "Location"] + isotope_cols]
+        "timeseries": timeseries,
+        "by_region": by_region,
     }
+    return LazyTables(DERIVED_TABLES, {name: apply_schema(tbl) for name, tbl in tables.items()})
+
+@trace.traced("make_tables")
+def make_tables(df_raw: pd.DataFrame):
+    """
+    Clean and prepare derived tables from the raw dataframe.
+    Returns a LazyTables: 'clean', 'timeseries' and 'by_region' are built here, the
+    DERIVED_TABLES ('normalized', 'geo') only when first read.
+    """
+
+    with trace.span("make_tables.clean", rows_in=len(df_raw)) as s:
+        df = clean_frame(df_raw.copy())
+        s.rows_out = len(df)
+    return finish_tables(df)
+
+def concat_clean(frames) -> pd.DataFrame:
+    """Concatenate cleaned frames, with the union of the categories so station columns stay categorical."""
+    frames = list(frames)
+    if not frames:
+        return apply_schema(pd.DataFrame(columns=list(SCHEMA)))
+    # mêmes catégories dans tous les blocs, sinon concat repasse en object
+    for col in frames[0].columns[frames[0].dtypes == "category"]:
+        categories = pd.api.types.union_categoricals([frame[col] for frame in frames], sort_categories=True).categories
+        for frame in frames:
+            frame[col] = frame[col].cat.set_categories(categories)
+    return pd.concat(frames)
+
+def finish_tables(df: pd.DataFrame):
+    """
+    Steps 3 to 8 of make_tables on a cleaned frame (see clean_frame): dedupe, QC flags, derived tables.
+    `df` is consumed: it is deduplicated and flagged in place and becomes the 'clean' table.
+    Missing readings stay NaN (flagged NOT_MEASURED), so the means of the derived tables skip them.
+    """
+    isotope_cols = ISOTOPE_COLS
+
+    # --- 3️⃣ Nettoyage des doublons ---
+    with trace.span("make_tables.dedupe", rows_in=len(df)) as s:
+        df.drop_duplicates(inplace=True)
+        s.rows_out = len(df)
+
+    # --- 4️⃣ Contrôle qualité : doublons (station, date) et valeurs aberrantes ---
+    # Les valeurs manquantes ne sont pas remplacées : elles restent NaN et portent NOT_MEASURED
+    with trace.span("make_tables.qc", rows_in=len(df)) as s:
+        qc.flag_table(df)
+        s.rows_out = len(df)
+
+    # --- 7️⃣ Résumé du nettoyage ---
+    _print_summary(len(df), df[isotope_cols].isna().sum())
+
+    with trace.span("make_tables.derive", rows_in=len(df)) as s:
+        # moyennes calculées en float64, avant la conversion en float32
+        timeseries = df.groupby("Date")[isotope_cols].mean().reset_index()
+        by_region = df.groupby("Location", observed=True)[isotope_cols].mean().reset_index()
+        apply_schema(df)
+        tables = _derived_tables(df, timeseries, by_region)
+        s.rows_out = trace.rows_of(tables)
+    return tables
+
+def _partial_aggregates(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Mergeable per-(Location, Date) aggregates of one cleaned chunk: for each isotope the sum and the
+    count of non-missing values, plus the row count.
+    """
+    values = df[ISOTOPE_COLS]
+    parts = pd.concat([values.add_suffix("|sum"), values.notna().add_suffix("|count")], axis=1)
+    parts["rows"] = 1
+    keys = [df["Location"].astype(object), df["Date"]]
+    return parts.groupby(keys, dropna=False, sort=False).sum()
+
+@trace.traced("make_tables_streaming")
+def make_tables_streaming(path, chunksize: int = 250_000):
+    """
+    Same tables as make_tables(io.read_raw(path)), built without holding the raw frame.
+
+    The CSV is read and cleaned chunk by chunk. Exact duplicates are dropped across chunks through
+    row hashes, and each chunk contributes mergeable per-(Location, Date) sums and counts, from which
+    the 'timeseries' / 'by_region' means are derived, so only the compact cleaned chunks are kept in memory.
+    """
+    isotope_cols = ISOTOPE_COLS
+    seen = np.empty(0, dtype=np.uint64)
+    chunks, partials = [], []
+
+    # --- 1️⃣ à 3️⃣ Nettoyage et dédoublonnage par blocs ---
+    with trace.span("make_tables_streaming.chunks") as s:
+        rows_read = 0
+        for raw in pd.read_csv(path, dtype=READ_DTYPES, chunksize=chunksize):
+            rows_read += len(raw)
+            chunk = clean_frame(raw)
+            hashes = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+            keep = ~(pd.Series(hashes).duplicated().to_numpy() | np.isin(hashes, seen))
+            if not keep.all():
+                chunk = chunk[keep].copy()
+            seen = np.union1d(seen, hashes[keep])
+            chunks.append(chunk)
+            partials.append(_partial_aggregates(chunk))
+        s.rows_in, s.rows_out = rows_read, sum(len(chunk) for chunk in chunks)
+
+    agg = pd.concat(partials).groupby(level=["Location", "Date"], dropna=False, sort=False).sum()
+    sums = pd.DataFrame(agg[[f"{col}|sum" for col in isotope_cols]].to_numpy(), columns=isotope_cols)
+    counts = pd.DataFrame(agg[[f"{col}|count" for col in isotope_cols]].to_numpy(), columns=isotope_cols)
+
+    with trace.span("make_tables_streaming.concat", rows_in=sum(len(chunk) for chunk in chunks)) as s:
+        df = concat_clean(chunks)
+        del chunks
+        s.rows_out = len(df)
+
+    # --- 4️⃣ Contrôle qualité : doublons (station, date) et valeurs aberrantes ---
+    with trace.span("make_tables_streaming.qc", rows_in=len(df)) as s:
+        qc.flag_table(df)
+        s.rows_out = len(df)
+
+    # --- 7️⃣ Résumé du nettoyage ---
+    _print_summary(len(df), df[isotope_cols].isna().sum())
 
+    with trace.span("make_tables_streaming.derive", rows_in=len(df)) as s:
+        # moyennes des valeurs mesurées : somme des sommes / somme des comptes
+        dates = agg.index.get_level_values("Date").to_numpy()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            timeseries = sums.groupby(dates).sum() / counts.groupby(dates).sum()
+        timeseries = timeseries.rename_axis("Date").sort_index().reset_index()
+        # comme groupby("Location") dans make_tables : les lignes sans Location n'ont pas de région
+        locations = agg.index.get_level_values("Location")
+        has_location = locations.notna()
+        by_location = locations[has_location].to_numpy()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            by_region = sums[has_location].groupby(by_location).sum() / counts[has_location].groupby(by_location).sum()
+        by_region = by_region.rename_axis("Location").sort_index().reset_index()
+        apply_schema(df)
+        tables = _derived_tables(df, timeseries, by_region)
+        s.rows_out = trace.rows_of(tables)
     return tables
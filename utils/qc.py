@@ -0,0 +1,153 @@
+"""
+Quality-control flags of the isotope readings.
+
+Each isotope column gets a uint8 companion column '<isotope>_qc' (see flag_col) whose bits record
+what the pipeline knows about the reading instead of silently discarding it:
+
+	BELOW_DETECTION   raw value was '<limit' (the limit is kept as the value)
+	NOT_MEASURED      empty or non-numeric code ('N', 'L', a bare '<'); the value stays NaN
+	COMMA_DECIMAL     raw value used a decimal comma ('0,5')
+	DUPLICATE         another row has the same station and date (exact copies are dropped)
+	OUTLIER           robust outlier against the station's neighbouring readings (rolling median / MAD)
+
+Parse flags are set by prep.clean_frame and the last two by flag_table(). Missing readings are not
+filled: the aggregates (timeseries, by_region, prefix sums) skip them.
+Every step is a column-wise array operation; the rolling median / MAD is computed for all stations
+at once over windows gathered from the (station, date)-sorted readings, in blocks of rows.
+"""
+import warnings
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from .schema import ISOTOPE_COLS
+
+BELOW_DETECTION = 1
+NOT_MEASURED = 2
+COMMA_DECIMAL = 4
+DUPLICATE = 8
+OUTLIER = 16
+
+# filter label → bit (sidebar filters, summaries)
+FLAGS = {
+	"below detection limit": BELOW_DETECTION,
+	"not measured": NOT_MEASURED,
+	"comma decimal": COMMA_DECIMAL,
+	"duplicate": DUPLICATE,
+	"outlier": OUTLIER,
+}
+
+# rolling window (readings of one station, centered), least readings in it, robust z threshold
+WINDOW = 7
+MIN_POINTS = 5
+THRESHOLD = 3.5
+# MAD → standard deviation for normally distributed data
+MAD_SCALE = 1.4826
+# rows per block of the windowed median (block × WINDOW floats in memory)
+BLOCK_ROWS = 1 << 18
+
+def flag_col(col: str) -> str:
+	return f"{col}_qc"
+
+QC_COLS = [flag_col(col) for col in ISOTOPE_COLS]
+
+def bits(labels: Iterable[str]) -> int:
+	"""OR of the FLAGS named in `labels`."""
+	out = 0
+	for label in labels:
+		out |= FLAGS[label]
+	return out
+
+def parse_flags(raw: pd.Series, parsed: pd.Series) -> np.ndarray:
+	"""BELOW_DETECTION / COMMA_DECIMAL / NOT_MEASURED bits of a raw string column and its parsed values."""
+	arr = pc.utf8_trim_whitespace(pa.array(raw.to_numpy(dtype=object), type=pa.string(), from_pandas=True))
+	flags = np.zeros(len(arr), dtype=np.uint8)
+	flags[pc.fill_null(pc.starts_with(arr, "<"), False).to_numpy(zero_copy_only=False)] |= BELOW_DETECTION
+	flags[pc.fill_null(pc.match_substring(arr, ","), False).to_numpy(zero_copy_only=False)] |= COMMA_DECIMAL
+	flags[np.isnan(parsed.to_numpy(dtype=np.float64, na_value=np.nan))] |= NOT_MEASURED
+	return flags
+
+def rolling_median_mad(values: np.ndarray, groups: np.ndarray, window: int = WINDOW, block_rows: int = BLOCK_ROWS):
+	"""
+	Centered rolling (median, MAD, number of readings) of `values` within runs of equal `groups`
+	(values sorted by group, then date; NaN = no reading). Windows are gathered as a (rows × window)
+	matrix per block of rows and reduced with nanmedian, with no per-station loop.
+	"""
+	n = len(values)
+	half = window // 2
+	offsets = np.arange(-half, half + 1)
+	median = np.full(n, np.nan)
+	mad = np.full(n, np.nan)
+	count = np.zeros(n, dtype=np.int64)
+	with warnings.catch_warnings():
+		warnings.simplefilter("ignore", RuntimeWarning)     # all-NaN windows
+		for start in range(0, n, block_rows):
+			rows = np.arange(start, min(start + block_rows, n))
+			idx = rows[:, None] + offsets[None, :]
+			inside = (idx >= 0) & (idx < n)
+			idx = np.clip(idx, 0, n - 1)
+			win = values[idx]
+			win[~inside | (groups[idx] != groups[rows][:, None])] = np.nan
+			med = np.nanmedian(win, axis=1)
+			median[rows] = med
+			mad[rows] = np.nanmedian(np.abs(win - med[:, None]), axis=1)
+			count[rows] = (~np.isnan(win)).sum(axis=1)
+	return median, mad, count
+
+def outlier_mask(values: np.ndarray, groups: np.ndarray, window: int = WINDOW, min_points: int = MIN_POINTS,
+		threshold: float = THRESHOLD) -> np.ndarray:
+	"""Readings whose robust z-score against their rolling window exceeds `threshold` (sorted inputs)."""
+	median, mad, count = rolling_median_mad(values, groups, window)
+	with np.errstate(invalid="ignore", divide="ignore"):
+		z = np.abs(values - median) / (MAD_SCALE * mad)
+	return (count >= min_points) & (mad > 0) & (z > threshold)
+
+def flag_table(df: pd.DataFrame, value_cols=ISOTOPE_COLS) -> pd.DataFrame:
+	"""
+	Set the DUPLICATE and OUTLIER bits of the '<isotope>_qc' columns of a cleaned frame (in place).
+	Outliers are looked for in log1p(value) of the measured readings only.
+	"""
+	if df.empty:
+		return df
+	station = df["Location"].astype("category").cat.codes.to_numpy()
+	dup = df.duplicated(subset=["Location", "Date"], keep=False).to_numpy() & (station >= 0)
+	order = np.lexsort((df["Date"].to_numpy(), station))
+	groups = station[order]
+	for col in value_cols:
+		flags = df[flag_col(col)].to_numpy(dtype=np.uint8).copy()
+		flags[dup] |= DUPLICATE
+		values = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+		usable = ((flags & NOT_MEASURED) == 0) & (station >= 0)
+		logged = np.where(usable, np.log1p(np.clip(values, 0.0, None)), np.nan)
+		outliers = np.zeros(len(df), dtype=bool)
+		outliers[order] = outlier_mask(logged[order], groups) & usable[order]
+		flags[outliers] |= OUTLIER
+		df[flag_col(col)] = flags
+	return df
+
+def hidden(df: pd.DataFrame, col: str, exclude: int) -> np.ndarray:
+	"""Rows whose `col` reading carries any of the `exclude` bits."""
+	return (df[flag_col(col)].to_numpy() & exclude) != 0
+
+def without_flagged(df: pd.DataFrame, exclude: int, value_cols=ISOTOPE_COLS) -> pd.DataFrame:
+	"""
+	`df` with the readings carrying any of the `exclude` bits set to NaN (the frame itself when exclude=0).
+	Only the masked value columns are new arrays: the other columns share the memory of `df`.
+	"""
+	if not exclude:
+		return df
+	out = df.copy(deep=False)
+	for col in value_cols:
+		rows = hidden(df, col, exclude)
+		if rows.any():
+			out[col] = df[col].mask(rows)
+	return out
+
+def summary(df: pd.DataFrame, value_cols=ISOTOPE_COLS) -> pd.DataFrame:
+	"""Number of readings carrying each flag, per isotope (one row per flag)."""
+	rows = {label: {col: int(((df[flag_col(col)].to_numpy() & bit) != 0).sum()) for col in value_cols if flag_col(col) in df}
+		for label, bit in FLAGS.items()}
+	return pd.DataFrame.from_dict(rows, orient="index").rename_axis("flag").reset_index()
@@ -0,0 +1,276 @@
+"""
+Headless queries over the cleaned dataset, for scripts and batch reports.
+
+The same cached tables as the dashboard (utils.io.load_tables), the same per-day index and per-station
+prefix sums, without a Streamlit server:
+
+	from utils.query import Dataset, query
+	ds = Dataset.load()
+	ds.stations(start="1986-04-28", end="1986-05-05", isotopes=["Cs-137"])
+	query("Cs-137", ("1986-04-28", "1986-05-05"), bbox=(5, 45, 15, 55))
+	ds.near(km=1000)                 # stations within 1000 km of the plant, nearest first
+
+Command line (CSV or Parquet, one file per station with --split-by Location):
+
+	python -m utils.query rows --isotope Cs-137 --start 1986-04-28 --end 1986-05-05 --output cs137.parquet
+	python -m utils.query stations --start 1986-05-01 --end 1986-05-07 --output reports/stations.csv
+	python -m utils.query peaks --split-by Location --output reports/ --format csv
+	python -m utils.query near -n 5 --lat 48.14 --lon 11.58
+"""
+import argparse
+import datetime as dt
+import sys
+from functools import cached_property
+from pathlib import Path
+from typing import Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .decay import fit_decay, isotope_label
+from .index import DateIndex
+from .prefix import StationPrefixSums
+from .schema import ISOTOPE_COLS
+from .spatial import StationIndex
+from .store import safe_name
+
+DateLike = Union[str, dt.date, pd.Timestamp, None]
+# (min longitude, min latitude, max longitude, max latitude)
+BBox = Tuple[float, float, float, float]
+
+KINDS = ("rows", "stations", "top", "timeseries", "peaks", "decay", "near")
+FORMATS = ("csv", "parquet")
+
+def resolve_isotopes(names: Optional[Sequence[str]]) -> list:
+	"""Column names for isotopes given as columns ('Cs_137_(Bq/m3)') or labels ('Cs-137'); all when empty."""
+	if not names:
+		return list(ISOTOPE_COLS)
+	by_label = {isotope_label(col).lower(): col for col in ISOTOPE_COLS}
+	cols = []
+	for name in names:
+		col = name if name in ISOTOPE_COLS else by_label.get(name.strip().lower())
+		if col is None:
+			raise ValueError(f"Unknown isotope {name!r}; expected one of {', '.join(isotope_label(c) for c in ISOTOPE_COLS)}")
+		cols.append(col)
+	return cols
+
+def _day(value: DateLike) -> Optional[dt.date]:
+	return None if value is None else pd.Timestamp(value).date()
+
+class Dataset:
+	"""The derived tables plus lazily built DateIndex / StationPrefixSums / StationIndex, queried without Streamlit."""
+
+	def __init__(self, tables: Mapping[str, pd.DataFrame]):
+		self.tables = tables
+
+	@classmethod
+	def load(cls) -> "Dataset":
+		"""The dashboard tables (columnar cache next to the CSV, rebuilt if stale)."""
+		from .io import load_tables
+		return cls(load_tables())
+
+	@cached_property
+	def index(self) -> DateIndex:
+		return DateIndex(self.tables["clean"])
+
+	@cached_property
+	def engine(self) -> StationPrefixSums:
+		return StationPrefixSums(self.index)
+
+	@cached_property
+	def spatial(self) -> StationIndex:
+		return StationIndex(self.tables["clean"])
+
+	def _span(self, start: DateLike, end: DateLike) -> Tuple[dt.date, dt.date]:
+		return _day(start) or self.index.first_day, _day(end) or self.index.last_day
+
+	def _where(self, df: pd.DataFrame, bbox: Optional[BBox], stations: Optional[Sequence[str]]) -> pd.DataFrame:
+		keep = np.ones(len(df), dtype=bool)
+		if bbox is not None:
+			# stations in the box from the spatial index (min_lon > max_lon wraps across ±180°)
+			keep &= self.spatial.bbox_mask(df, bbox)
+		if stations:
+			keep &= df["Location"].isin(list(stations)).to_numpy()
+		return df if keep.all() else df[keep]
+
+	def rows(self, isotopes=None, start: DateLike = None, end: DateLike = None, bbox: Optional[BBox] = None,
+			stations: Optional[Sequence[str]] = None) -> pd.DataFrame:
+		"""Measurement rows of the clean table in [start, end] (inclusive days), date-sorted."""
+		cols = resolve_isotopes(isotopes)
+		rows = self.index.rows_between(*self._span(start, end))
+		rows = self._where(rows, bbox, stations)
+		meta = [col for col in rows.columns if col not in ISOTOPE_COLS]
+		return rows[meta + cols].reset_index(drop=True)
+
+	def stations(self, isotopes=None, start: DateLike = None, end: DateLike = None, bbox: Optional[BBox] = None,
+			stations: Optional[Sequence[str]] = None, stat: str = "mean") -> pd.DataFrame:
+		"""One row per station measured in [start, end]: coordinates, `stat` ('mean' / 'sum') per isotope, Count."""
+		cols = resolve_isotopes(isotopes)
+		frame = self._where(self.engine.station_frame(*self._span(start, end), stat=stat), bbox, stations)
+		return frame[["Location", "Latitude", "Longitude"] + cols + ["Count"]].reset_index(drop=True)
+
+	def top(self, isotopes=None, start: DateLike = None, end: DateLike = None, n: int = 10,
+			bbox: Optional[BBox] = None, stations: Optional[Sequence[str]] = None) -> pd.DataFrame:
+		"""Top `n` stations by total concentration (selected isotopes summed) over [start, end]."""
+		frame = self.stations(isotopes, start, end, bbox, stations, stat="sum")
+		cols = resolve_isotopes(isotopes)
+		total = frame[cols].sum(axis=1, min_count=1)
+		ranked = frame.assign(total=total).dropna(subset=["total"]).sort_values("total", ascending=False, kind="stable")
+		return ranked[["Location", "Latitude", "Longitude", "total"]].head(n).reset_index(drop=True)
+
+	def _daily(self, start: DateLike, end: DateLike) -> pd.DataFrame:
+		"""Rows of the 'timeseries' table (daily means over all stations) in [start, end]."""
+		ts = self.tables["timeseries"]
+		first, last = self._span(start, end)
+		return ts[(ts["Date"] >= pd.Timestamp(first)) & (ts["Date"] < pd.Timestamp(last) + pd.Timedelta(days=1))]
+
+	def timeseries(self, isotopes=None, start: DateLike = None, end: DateLike = None, bbox: Optional[BBox] = None,
+			stations: Optional[Sequence[str]] = None) -> pd.DataFrame:
+		"""
+		Daily mean per isotope over all stations (or the stations in `bbox` / `stations`, averaged from
+		their rows), long format (Date / Isotope / Concentration).
+		"""
+		cols = resolve_isotopes(isotopes)
+		if bbox is None and not stations:
+			ts = self._daily(start, end)
+		else:
+			rows = self.rows(cols, start, end, bbox, stations)
+			ts = rows.groupby(rows["Date"].dt.floor("D"))[cols].mean().reset_index()
+		return ts.melt(id_vars="Date", value_vars=cols, var_name="Isotope", value_name="Concentration").reset_index(drop=True)
+
+	def peaks(self, isotopes=None, start: DateLike = None, end: DateLike = None, bbox: Optional[BBox] = None,
+			stations: Optional[Sequence[str]] = None, by: Optional[str] = "Location") -> pd.DataFrame:
+		"""
+		Highest reading per isotope (per `by` group, e.g. station; overall when by=None) in [start, end]:
+		group, Isotope, Date and Concentration of the first maximum.
+		"""
+		cols = resolve_isotopes(isotopes)
+		rows = self.rows(cols, start, end, bbox, stations)
+		keys = [by] if by else []
+		long = rows.melt(id_vars=["Date"] + keys, value_vars=cols, var_name="Isotope", value_name="Concentration")
+		long = long.dropna(subset=["Concentration"])
+		if long.empty:
+			return pd.DataFrame(columns=keys + ["Isotope", "Date", "Concentration"])
+		best = long.groupby(keys + ["Isotope"], observed=True, sort=True)["Concentration"].idxmax()
+		return long.loc[best.to_numpy(), keys + ["Isotope", "Date", "Concentration"]].reset_index(drop=True)
+
+	def decay(self, isotopes=None, start: DateLike = None, end: DateLike = None, bbox: Optional[BBox] = None,
+			stations: Optional[Sequence[str]] = None, by: Optional[str] = "Location") -> pd.DataFrame:
+		"""Post-peak log-linear decay fits (decay.fit_decay) per `by` group × isotope; daily series when by=None."""
+		cols = resolve_isotopes(isotopes)
+		if by is None and bbox is None and not stations:
+			return fit_decay(self._daily(start, end), cols)
+		return fit_decay(self.rows(cols, start, end, bbox, stations), cols, by=[by] if by else None)
+
+	def near(self, isotopes=None, start: DateLike = None, end: DateLike = None, km: Optional[float] = None,
+			n: int = 10, lat: Optional[float] = None, lon: Optional[float] = None, bbox: Optional[BBox] = None,
+			stations: Optional[Sequence[str]] = None) -> pd.DataFrame:
+		"""
+		Stations within `km` of (lat, lon), or its `n` nearest when km is None (default point: the plant),
+		nearest first, with their mean per isotope and Count over [start, end]. With `bbox` / `stations`,
+		only the stations matching them are listed (the `n` nearest among those).
+		"""
+		filtered = bbox is not None or bool(stations)
+		if km is not None:
+			found = self.spatial.within_km(km, lat, lon)
+		else:
+			found = self.spatial.nearest(len(self.spatial.stations) if filtered else n, lat, lon)
+		if filtered:
+			found = self._where(found, bbox, stations).head(n if km is None else len(found)).reset_index(drop=True)
+		stats = self.stations(isotopes, start, end, stations=found["Location"].tolist())
+		stats = stats.drop(columns=["Latitude", "Longitude"]).astype({"Location": str})
+		return found.merge(stats, on="Location", how="left")
+
+	def run(self, kind: str, **filters) -> pd.DataFrame:
+		"""Dispatch to one of KINDS by name (used by query() and the CLI)."""
+		if kind not in KINDS:
+			raise ValueError(f"Unknown query kind {kind!r}; expected one of {', '.join(KINDS)}")
+		return getattr(self, kind)(**filters)
+
+_default: Optional[Dataset] = None
+
+def query(isotope=None, date_range: Optional[Tuple[DateLike, DateLike]] = None, bbox: Optional[BBox] = None,
+		stations: Optional[Sequence[str]] = None, kind: str = "rows", dataset: Optional[Dataset] = None) -> pd.DataFrame:
+	"""
+	One-call query: `kind` (see KINDS) for an isotope (or list, all when None) over an inclusive
+	(start, end) date range, bounding box and/or station list. The dataset is loaded once per process.
+	"""
+	global _default
+	if dataset is None:
+		if _default is None:
+			_default = Dataset.load()
+		dataset = _default
+	isotopes = [isotope] if isinstance(isotope, str) else isotope
+	start, end = date_range or (None, None)
+	filters = {"isotopes": isotopes, "start": start, "end": end, "bbox": bbox, "stations": stations}
+	return dataset.run(kind, **filters)
+
+def write(df: pd.DataFrame, path: Path, fmt: str) -> None:
+	"""Write `df` as CSV or Parquet (through a temp file, so readers never see a partial report)."""
+	path.parent.mkdir(parents=True, exist_ok=True)
+	tmp = path.with_name(path.name + ".tmp")
+	if fmt == "parquet":
+		df.to_parquet(tmp, index=False)
+	else:
+		df.to_csv(tmp, index=False)
+	tmp.replace(path)
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Query the cleaned Chernobyl dataset without Streamlit.")
+	parser.add_argument("kind", choices=KINDS, help="what to compute")
+	parser.add_argument("--isotope", action="append", help="isotope label or column (repeatable, default: all)")
+	parser.add_argument("--start", help="first day, YYYY-MM-DD (default: first day of the data)")
+	parser.add_argument("--end", help="last day, YYYY-MM-DD (inclusive, default: last day of the data)")
+	parser.add_argument("--bbox", help="min_lon,min_lat,max_lon,max_lat")
+	parser.add_argument("--station", action="append", help="station (Location) name, repeatable")
+	parser.add_argument("-n", type=int, default=10, help="number of stations for 'top' / 'near'")
+	parser.add_argument("--km", type=float, help="'near': radius in km (default: the -n nearest stations)")
+	parser.add_argument("--lat", type=float, help="'near': latitude of the point (default: the plant)")
+	parser.add_argument("--lon", type=float, help="'near': longitude of the point (default: the plant)")
+	parser.add_argument("--by", default="Location", help="group column for 'peaks' / 'decay' ('none' for overall)")
+	parser.add_argument("--split-by", help="write one file per value of this column into the --output directory")
+	parser.add_argument("--format", choices=FORMATS, help="output format (default: from the extension, else csv)")
+	parser.add_argument("--output", help="output file (or directory with --split-by); stdout (CSV) when omitted")
+	args = parser.parse_args(argv)
+
+	try:
+		bbox = tuple(float(v) for v in args.bbox.split(",")) if args.bbox else None
+		if bbox is not None and len(bbox) != 4:
+			raise ValueError("--bbox needs 4 comma-separated numbers")
+		filters = {"isotopes": args.isotope, "start": args.start, "end": args.end, "bbox": bbox, "stations": args.station}
+		if args.kind in ("top", "near"):
+			filters["n"] = args.n
+		if args.kind == "near":
+			if (args.lat is None) != (args.lon is None):
+				raise ValueError("--lat and --lon go together")
+			filters.update(km=args.km, lat=args.lat, lon=args.lon)
+		if args.kind in ("peaks", "decay"):
+			filters["by"] = None if args.by.lower() == "none" else args.by
+		resolve_isotopes(args.isotope)
+	except ValueError as exc:
+		parser.error(str(exc))
+
+	result = Dataset.load().run(args.kind, **filters)
+
+	output = Path(args.output) if args.output else None
+	fmt = args.format or ("parquet" if output is not None and output.suffix == ".parquet" else "csv")
+	if args.split_by:
+		if output is None:
+			parser.error("--split-by needs --output DIRECTORY")
+		if args.split_by not in result.columns:
+			parser.error(f"--split-by: no column {args.split_by!r} in the result ({', '.join(result.columns)})")
+		for value, part in result.groupby(args.split_by, observed=True, sort=True):
+			write(part, output / f"{safe_name(value)}.{fmt}", fmt)
+		print(f"{result[args.split_by].nunique()} files, {len(result)} rows written to {output}", file=sys.stderr)
+	elif output is None:
+		try:
+			result.to_csv(sys.stdout, index=False)
+		except BrokenPipeError:
+			# reader closed the pipe early (e.g. `| head`): not an error for a report dump
+			sys.stderr.close()
+	else:
+		write(result, output, fmt)
+		print(f"{len(result)} rows written to {output}", file=sys.stderr)
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,56 @@
+"""
+Column schema of the in-memory tables.
+
+Station identifiers are categorical, country codes small nullable ints, coordinates and isotope
+readings float32 (enough for the instrument precision, half the size of float64) and dates
+datetime64. READ_DTYPES is what read_csv can apply directly; apply_schema() converts the remaining
+columns once they are cleaned and is applied to every derived table.
+"""
+from typing import Mapping
+
+import numpy as np
+import pandas as pd
+
+ISOTOPE_COLS = ["I_131_(Bq/m3)", "Cs_134_(Bq/m3)", "Cs_137_(Bq/m3)"]
+
+SCHEMA = {
+	"PAYS": "category",
+	"Code": "Int16",
+	"Location": "category",
+	"Longitude": "float32",
+	"Latitude": "float32",
+	"Date": "datetime64[ns]",
+	**{col: "float32" for col in ISOTOPE_COLS},
+}
+
+# Applied by read_csv: categorical station columns, everything else kept as strings until cleaned
+READ_DTYPES = {col: ("category" if dtype == "category" else str) for col, dtype in SCHEMA.items()}
+
+def _coerce(values: pd.Series, dtype: str) -> pd.Series:
+	if dtype == "category":
+		return values.astype("category")
+	if dtype.startswith("datetime64"):
+		return pd.to_datetime(values, errors="coerce").astype(dtype)
+	numbers = pd.to_numeric(values, errors="coerce")
+	if dtype == "Int16":
+		# non-integer or out-of-range codes become missing instead of failing the cast
+		info = np.iinfo(np.int16)
+		valid = (numbers == numbers.round()) & numbers.between(info.min, info.max)
+		return numbers.where(valid).astype("Int16")
+	return numbers.astype(dtype)
+
+def apply_schema(df: pd.DataFrame, schema: Mapping[str, str] = SCHEMA) -> pd.DataFrame:
+	"""Cast the columns of `df` listed in `schema` (in place) and return it."""
+	for col, dtype in schema.items():
+		if col in df.columns and str(df[col].dtype) != dtype:
+			df[col] = _coerce(df[col], dtype)
+	return df
+
+def memory_report(tables: Mapping[str, pd.DataFrame]) -> pd.DataFrame:
+	"""Rows, columns and deep memory usage (MB) of each table."""
+	rows = [
+		{"table": name, "rows": len(tbl), "columns": tbl.shape[1],
+		 "memory (MB)": round(tbl.memory_usage(deep=True).sum() / 1e6, 3)}
+		for name, tbl in tables.items()
+	]
+	return pd.DataFrame(rows, columns=["table", "rows", "columns", "memory (MB)"])
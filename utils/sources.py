@@ -0,0 +1,260 @@
+"""
+Multi-source ingestion: several monitoring exports merged into one dataset.
+
+`sources.json` (next to seeds.json) lists the sources; when it lists none, the dashboard uses the
+single CSV of seeds.json as before.
+
+	{"sources": [
+		{"name": "kaggle", "path": "data/Chernobyl_ Chemical_Radiation.csv"},
+		{"name": "irsn", "url": "https://.../irsn.csv", "sha256": "", "sep": ";", "date_format": "%d/%m/%Y",
+		 "columns": {"Station": "Location"}}
+	]}
+
+`make ingest` fetches the sources with a url (utils/download.py) and checks their sha256. The
+dashboard only reads local files: the dataset key, the fingerprint and ingest() never download, and
+a missing file or a checksum mismatch raises instead.
+
+Sources are parsed in a thread pool. Their columns are renamed to the make_tables schema: the
+source's own "columns" first, then COLUMN_ALIASES for the targets still missing. The date is read
+with the source's "date_format" (default: that of the original CSV), and the result is cleaned
+with prep.clean_frame. Each cleaned source is cached as Feather under data/sources.cache/parts/,
+keyed by its content hash, declared sha256, options and PIPELINE_VERSION, so only the sources that
+changed are parsed again.
+
+The cleaned sources are then concatenated in manifest order. A (Location, Date, readings) row
+already reported by an earlier source is dropped. prep.finish_tables deduplicates, sets the QC
+flags (missing readings stay NaN) and derives the tables, which are cached like the single-CSV ones.
+"""
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pyarrow import feather
+
+from . import store, trace
+from .download import DATA_DIR, ROOT, download
+from .prep import DATE_FORMAT, PIPELINE_VERSION, clean_frame, concat_clean, finish_tables
+from .schema import ISOTOPE_COLS, READ_DTYPES, SCHEMA
+from .tables import LazyTables
+
+MANIFEST = ROOT / "sources.json"
+# cache anchor of the merged dataset: its tables go to data/sources.cache/ (see store.cache_dir)
+ANCHOR = DATA_DIR / "sources"
+MAX_WORKERS = 8
+
+# normalized header (lower case, letters and digits only) → make_tables column
+COLUMN_ALIASES = {
+	**{alias: "PAYS" for alias in ("pays", "country", "countrycode", "land")},
+	**{alias: "Code" for alias in ("code", "stationcode")},
+	**{alias: "Location" for alias in ("location", "station", "stationname", "site", "city", "place")},
+	**{alias: "Longitude" for alias in ("longitude", "lon", "lng", "long")},
+	**{alias: "Latitude" for alias in ("latitude", "lat")},
+	**{alias: "Date" for alias in ("date", "day", "sampledate", "samplingdate", "datum")},
+	**{alias: "I_131_(Bq/m3)" for alias in ("i131bqm3", "i131", "iodine131")},
+	**{alias: "Cs_134_(Bq/m3)" for alias in ("cs134bqm3", "cs134", "caesium134", "cesium134")},
+	**{alias: "Cs_137_(Bq/m3)" for alias in ("cs137bqm3", "cs137", "caesium137", "cesium137")},
+}
+# options of a source that change its parsed content (part of its cache key)
+PARSE_OPTIONS = ("sep", "encoding", "date_format", "columns")
+
+def _normalized_header(name: str) -> str:
+	return re.sub(r"[^a-z0-9]", "", str(name).lower())
+
+def read_manifest(path: Path = MANIFEST) -> List[dict]:
+	"""The sources listed in the manifest (empty when the file is missing or lists none)."""
+	if not path.exists():
+		return []
+	manifest = json.loads(path.read_text(encoding="utf-8"))
+	sources = manifest.get("sources") or []
+	names = [source.get("name") for source in sources]
+	if any(not name for name in names) or len(set(names)) != len(names):
+		raise ValueError(f"{path.name}: every source needs a unique 'name'")
+	# the names also name files (data/<name>.csv, cached parts): they must stay unique as file names,
+	# case-insensitive file systems included
+	files = [store.safe_name(name).lower() for name in names]
+	if len(set(files)) != len(files):
+		clashes = sorted(name for name, file in zip(names, files) if files.count(file) > 1)
+		raise ValueError(f"{path.name}: source names {clashes} map to the same file name, rename one of them")
+	for source in sources:
+		if not source.get("path") and not source.get("url"):
+			raise ValueError(f"{path.name}: source {source['name']!r} needs a 'path' or a 'url'")
+	return sources
+
+def source_path(source: dict) -> Path:
+	"""Local file of a source: its 'path' (relative to the repository), else data/<name>.csv for a url."""
+	if source.get("path"):
+		path = Path(source["path"])
+		return path if path.is_absolute() else ROOT / path
+	return DATA_DIR / f"{store.safe_name(source['name'])}.csv"
+
+def declared_sha256(source: dict) -> Optional[str]:
+	"""The 'sha256' a source declares (lower case), or None."""
+	return (source.get("sha256") or "").strip().lower() or None
+
+def fetch(source: dict, refresh: bool = False) -> Path:
+	"""Local file of `source`, downloaded (or revalidated with refresh=True) when it has a url."""
+	path = source_path(source)
+	url = source.get("url")
+	expected = declared_sha256(source)
+	if url and (refresh or not path.exists() or (expected and store.file_hash(path) != expected)):
+		download(url, path, sha256=expected)
+	if not path.exists():
+		raise FileNotFoundError(f"Source {source['name']!r}: {path} not found and no url to download it from")
+	return path
+
+def local_path(source: dict) -> Path:
+	"""
+	Local file of `source`, which must already exist and match its declared sha256: never downloaded
+	here (see fetch / `make ingest`), so the dashboard never waits on the network.
+	"""
+	path = source_path(source)
+	if not path.exists():
+		raise FileNotFoundError(f"Source {source['name']!r}: {path} not found, run `make ingest` to fetch it")
+	expected = declared_sha256(source)
+	if expected and store.file_hash(path) != expected:
+		raise ValueError(f"Source {source['name']!r}: {path} does not match its sha256, run `make ingest` to fetch it again")
+	return path
+
+def source_key(source: dict, path: Path) -> dict:
+	"""Cache key of one parsed source: content hash, declared sha256, parse options and pipeline version."""
+	return {
+		"sha256": store.file_hash(path),
+		"declared_sha256": declared_sha256(source),
+		"options": {name: source.get(name) for name in PARSE_OPTIONS},
+		"pipeline": PIPELINE_VERSION,
+	}
+
+def normalize_columns(df: pd.DataFrame, columns: Optional[dict] = None) -> pd.DataFrame:
+	"""
+	Rename the columns of a raw source to the make_tables schema (explicit `columns` first, then
+	COLUMN_ALIASES), drop the others and add the missing ones as empty strings.
+	"""
+	explicit = [(col, target) for col, target in (columns or {}).items() if col in df.columns]
+	aliased = [(col, COLUMN_ALIASES.get(_normalized_header(col))) for col in df.columns]
+	renamed = {}
+	# explicit renames take their targets first, aliases fill the remaining ones
+	for col, target in explicit + aliased:
+		if col not in renamed and target in SCHEMA and target not in renamed.values():
+			renamed[col] = target
+	out = df[list(renamed)].rename(columns=renamed)
+	for col in SCHEMA:
+		if col not in out.columns:
+			out[col] = pd.Series(pd.NA, index=out.index, dtype=object)
+	# decimal commas in coordinates ('12,07'); isotope readings are handled by parse_measurement
+	for col in ("Longitude", "Latitude"):
+		if out[col].dtype == object:
+			out[col] = out[col].str.replace(",", ".", regex=False)
+	return out[list(SCHEMA)]
+
+def parse_source(source: dict, path: Path) -> pd.DataFrame:
+	"""Read and clean one source into the schema of prep.clean_frame (not deduplicated nor filled)."""
+	raw = pd.read_csv(path, sep=source.get("sep", ","), encoding=source.get("encoding", "utf-8"),
+		dtype=str, keep_default_na=True)
+	raw = normalize_columns(raw, source.get("columns"))
+	raw = raw.astype({col: dtype for col, dtype in READ_DTYPES.items() if dtype == "category"})
+	return clean_frame(raw, source.get("date_format", DATE_FORMAT)).reset_index(drop=True)
+
+def _parts_dir() -> Path:
+	return store.cache_dir(ANCHOR) / "parts"
+
+def load_source(source: dict) -> Tuple[pd.DataFrame, dict, bool]:
+	"""
+	(cleaned frame, cache key, True when it was parsed now) of one source, from its cached part when
+	unchanged. The file must already be local (see local_path).
+	"""
+	path = local_path(source)
+	key = source_key(source, path)
+	folder = _parts_dir()
+	part = folder / f"{store.safe_name(source['name'])}.feather"
+	meta = part.with_suffix(".json")
+	try:
+		if json.loads(meta.read_text(encoding="utf-8")) == key and part.exists():
+			return feather.read_feather(part), key, False
+	except (OSError, ValueError):
+		pass
+	df = parse_source(source, path)
+	try:
+		folder.mkdir(parents=True, exist_ok=True)
+		tmp = part.with_suffix(f".feather.{os.getpid()}.tmp")
+		feather.write_feather(df, tmp, compression="uncompressed")
+		os.replace(tmp, part)
+		tmp = meta.with_suffix(f".json.{os.getpid()}.tmp")
+		tmp.write_text(json.dumps(key, indent=2), encoding="utf-8")
+		os.replace(tmp, meta)
+	except OSError as e:
+		print(f"Could not cache source {source['name']!r}: {e}")
+	return df, key, True
+
+def drop_cross_source_duplicates(frames: List[pd.DataFrame]) -> List[pd.DataFrame]:
+	"""Drop the rows whose (Location, Date, readings) were already reported by an earlier frame."""
+	keys = ["Location", "Date"] + ISOTOPE_COLS
+	seen = np.empty(0, dtype=np.uint64)
+	out = []
+	for frame in frames:
+		hashes = pd.util.hash_pandas_object(frame[keys].astype({"Location": object}), index=False).to_numpy()
+		earlier = np.isin(hashes, seen)
+		out.append(frame[~earlier].reset_index(drop=True) if earlier.any() else frame)
+		seen = np.union1d(seen, hashes)
+	return out
+
+def dataset_key(sources: List[dict]) -> dict:
+	"""Cache key of the merged tables: every source key, in manifest order, from the local files only."""
+	return {
+		"sources": [[source["name"], source_key(source, local_path(source))] for source in sources],
+		"pipeline": PIPELINE_VERSION,
+	}
+
+def key_digest(key: dict) -> str:
+	"""Content identifier of a dataset_key (see io.data_fingerprint)."""
+	return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+def ingest(sources: List[dict], max_workers: int = MAX_WORKERS):
+	"""Merged tables (prep.finish_tables) of the local files of `sources`, parsed in a thread pool."""
+	with trace.span("sources.ingest") as s:
+		with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(sources)))) as pool:
+			loaded = list(pool.map(load_source, sources))
+		for source, (df, _, parsed) in zip(sources, loaded):
+			print(f"   {source['name']}: {len(df)} rows ({'parsed' if parsed else 'cached'})")
+		frames = drop_cross_source_duplicates([df for df, _, _ in loaded])
+		s.rows_in = sum(len(df) for df, _, _ in loaded)
+		s.rows_out = sum(len(frame) for frame in frames)
+	return finish_tables(concat_clean(frames))
+
+def load_tables(sources: List[dict], refresh: bool = False, key: Optional[dict] = None) -> LazyTables:
+	"""
+	Merged tables of `sources` from data/sources.cache/, re-ingested when any source changed.
+	`key` is their dataset_key when the caller already has it. Only refresh=True (`make ingest`)
+	downloads the sources, first; otherwise missing or mismatching files raise (see local_path).
+	"""
+	if refresh:
+		for source in sources:
+			fetch(source, refresh=True)
+		key = None
+	if key is None:
+		key = dataset_key(sources)
+	def build():
+		trace.cache_miss()
+		return ingest(sources)
+	with trace.span("load_tables", cached=True) as s:
+		tables = store.load_or_build(ANCHOR, build, PIPELINE_VERSION, key=key)
+		s.rows_out = trace.rows_of(tables)
+	return tables
+
+if __name__ == "__main__":
+	import sys
+	try:
+		manifest = read_manifest()
+		if not manifest:
+			print(f"{MANIFEST.name} lists no sources: the dashboard uses the single CSV of seeds.json.")
+			sys.exit(0)
+		tables = load_tables(manifest, refresh=True)
+		print(f"{len(manifest)} sources → {len(tables['clean'])} rows in {store.cache_dir(ANCHOR)}")
+	except Exception as exc:
+		print("Error:", exc, file=sys.stderr)
+		sys.exit(1)
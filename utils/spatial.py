@@ -0,0 +1,184 @@
+"""
+Spatial index of the stations: radius, k-nearest and bounding-box queries with haversine distances.
+
+Points are bucketed in a regular latitude/longitude grid, sorted by cell with an offsets array (the
+DateIndex layout, in two dimensions). A query only measures the points of the cells overlapping its
+bounding box, and the exact great-circle distance filter is one vectorized haversine over those.
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+EARTH_RADIUS_KM = 6371.0088
+# Chernobyl nuclear power plant (latitude, longitude)
+CHERNOBYL = (51.389, 30.099)
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+	"""Great-circle distance in km between points given in degrees (numpy broadcasting rules)."""
+	lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+	a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+	return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def valid_coords(lat, lon) -> np.ndarray:
+	"""Mask of usable coordinates: finite, in range and not the (0, 0) placeholder of missing positions."""
+	lat, lon = np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64)
+	with np.errstate(invalid="ignore"):
+		return (np.abs(lat) <= 90) & (np.abs(lon) <= 180) & ~((lat == 0) & (lon == 0))
+
+class GridIndex:
+	"""
+	Points sorted by grid cell (`cell_deg` degrees): `offsets[i]:offsets[i + 1]` spans the points of
+	`cells[i]` in `order`. All methods return positions into the original lat/lon arrays.
+	"""
+
+	def __init__(self, lat, lon, cell_deg: float = 1.0):
+		self.lat = np.asarray(lat, dtype=np.float64)
+		self.lon = np.asarray(lon, dtype=np.float64)
+		self.cell_deg = float(cell_deg)
+		self.n_rows = int(np.ceil(180.0 / self.cell_deg)) + 1
+		self.n_cols = int(np.ceil(360.0 / self.cell_deg))
+		cell = self._cell(self._row(self.lat), self._col(self.lon))
+		self.order = np.argsort(cell, kind="stable")
+		sorted_cells = cell[self.order]
+		self.cells = np.unique(sorted_cells)
+		self.offsets = np.append(np.searchsorted(sorted_cells, self.cells, side="left"), len(sorted_cells))
+
+	def __len__(self) -> int:
+		return len(self.lat)
+
+	def _row(self, lat) -> np.ndarray:
+		return np.clip(np.floor((np.asarray(lat) + 90.0) / self.cell_deg), 0, self.n_rows - 1).astype(np.int64)
+
+	def _col(self, lon) -> np.ndarray:
+		return (np.floor((np.asarray(lon) + 180.0) / self.cell_deg).astype(np.int64)) % self.n_cols
+
+	def _cell(self, row, col) -> np.ndarray:
+		return row * self.n_cols + col
+
+	def _candidates(self, min_lat: float, max_lat: float, min_lon: float, max_lon: float) -> np.ndarray:
+		"""Positions of the points in the cells overlapping the box (min_lon > max_lon crosses ±180°)."""
+		rows = np.arange(self._row(min_lat), self._row(max_lat) + 1)
+		if max_lon - min_lon >= 360.0:
+			cols = np.arange(self.n_cols)
+		else:
+			first, last = int(self._col(min_lon)), int(self._col(max_lon))
+			span = (last - first) % self.n_cols
+			if span == 0 and min_lon > max_lon:    # wraps around from inside the same cell
+				span = self.n_cols - 1
+			cols = (first + np.arange(span + 1)) % self.n_cols
+		wanted = self._cell(rows[:, None], cols[None, :]).ravel()
+		pos = np.searchsorted(self.cells, wanted)
+		found = pos < len(self.cells)
+		found[found] = self.cells[pos[found]] == wanted[found]
+		starts, ends = self.offsets[pos[found]], self.offsets[pos[found] + 1]
+		if len(starts) == 0:
+			return np.empty(0, dtype=np.int64)
+		# concatenated ranges starts[i]:ends[i] without a Python loop
+		lengths = ends - starts
+		steps = np.ones(lengths.sum(), dtype=np.int64)
+		heads = np.cumsum(lengths)[:-1]
+		steps[0] = starts[0]
+		steps[heads] = starts[1:] - ends[:-1] + 1
+		return self.order[np.cumsum(steps)]
+
+	def bbox(self, min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> np.ndarray:
+		"""Positions of the points inside the box (sorted); min_lon > max_lon wraps across ±180°."""
+		cand = self._candidates(min_lat, max_lat, min_lon, max_lon)
+		lat, lon = self.lat[cand], self.lon[cand]
+		in_lon = (lon >= min_lon) & (lon <= max_lon) if min_lon <= max_lon else (lon >= min_lon) | (lon <= max_lon)
+		return np.sort(cand[(lat >= min_lat) & (lat <= max_lat) & in_lon])
+
+	def within(self, lat: float, lon: float, radius_km: float) -> Tuple[np.ndarray, np.ndarray]:
+		"""(positions, distances in km) of the points within `radius_km` of (lat, lon), nearest first."""
+		dlat = np.degrees(radius_km / EARTH_RADIUS_KM)
+		min_lat, max_lat = lat - dlat, lat + dlat
+		if min_lat <= -90.0 or max_lat >= 90.0 or radius_km >= np.pi * EARTH_RADIUS_KM / 2:
+			min_lon, max_lon = -180.0, 180.0 + 360.0       # every longitude
+		else:
+			# widest longitude span of the circle, reached at its highest |latitude|
+			dlon = np.degrees(radius_km / (EARTH_RADIUS_KM * np.cos(np.radians(max(abs(min_lat), abs(max_lat))))))
+			min_lon, max_lon = lon - dlon, lon + dlon
+			if dlon >= 180.0:
+				min_lon, max_lon = -180.0, 180.0 + 360.0
+		cand = self._candidates(max(min_lat, -90.0), min(max_lat, 90.0), min_lon, max_lon)
+		dist = haversine_km(lat, lon, self.lat[cand], self.lon[cand])
+		keep = dist <= radius_km
+		cand, dist = cand[keep], dist[keep]
+		order = np.argsort(dist, kind="stable")
+		return cand[order], dist[order]
+
+	def nearest(self, lat: float, lon: float, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+		"""(positions, distances in km) of the `k` points nearest to (lat, lon), nearest first."""
+		k = min(k, len(self))
+		if k <= 0:
+			return np.empty(0, dtype=np.int64), np.empty(0)
+		# grow the search radius until it holds k points: the k nearest are then all inside it
+		radius = self.cell_deg * 111.2
+		while True:
+			pos, dist = self.within(lat, lon, radius)
+			if len(pos) >= k or radius >= np.pi * EARTH_RADIUS_KM:
+				return pos[:k], dist[:k]
+			radius *= 2
+
+class StationIndex:
+	"""
+	One entry per station with valid coordinates (first reported position), indexed by GridIndex.
+	`stations` holds Location, Latitude, Longitude and 'distance_km' from `source` (the plant).
+	"""
+
+	def __init__(self, df: pd.DataFrame, source: Tuple[float, float] = CHERNOBYL, cell_deg: float = 1.0):
+		coords = df.groupby("Location", observed=True, sort=True)[["Latitude", "Longitude"]].first().reset_index()
+		coords = coords[valid_coords(coords["Latitude"], coords["Longitude"])].reset_index(drop=True)
+		coords["Location"] = coords["Location"].astype(str)
+		self.source = source
+		coords["distance_km"] = haversine_km(source[0], source[1], coords["Latitude"], coords["Longitude"])
+		self.stations = coords
+		self.grid = GridIndex(coords["Latitude"], coords["Longitude"], cell_deg)
+		self._distance = pd.Series(coords["distance_km"].to_numpy(), index=coords["Location"])
+
+	def _frame(self, pos: np.ndarray, dist: Optional[np.ndarray] = None) -> pd.DataFrame:
+		out = self.stations.iloc[pos].reset_index(drop=True)
+		if dist is not None:
+			out.insert(3, "query_distance_km", dist)
+		return out
+
+	def _query(self, method, lat: Optional[float], lon: Optional[float], arg) -> pd.DataFrame:
+		"""Run a grid query around (lat, lon), or around the source (whose distance is already a column)."""
+		if lat is None or lon is None:
+			return self._frame(method(*self.source, arg)[0])
+		return self._frame(*method(lat, lon, arg))
+
+	def within_km(self, radius_km: float, lat: Optional[float] = None, lon: Optional[float] = None) -> pd.DataFrame:
+		"""Stations within `radius_km` of (lat, lon) (default: the source), nearest first."""
+		return self._query(self.grid.within, lat, lon, radius_km)
+
+	def nearest(self, k: int = 5, lat: Optional[float] = None, lon: Optional[float] = None) -> pd.DataFrame:
+		"""The `k` stations nearest to (lat, lon) (default: the source)."""
+		return self._query(self.grid.nearest, lat, lon, k)
+
+	def in_bbox(self, min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> pd.DataFrame:
+		"""Stations inside a (min_lon, min_lat, max_lon, max_lat) box."""
+		return self._frame(self.grid.bbox(min_lon, min_lat, max_lon, max_lat))
+
+	def bbox_mask(self, df: pd.DataFrame, bbox) -> np.ndarray:
+		"""Boolean mask of the rows of `df` (map points, measurements) whose station lies in `bbox`."""
+		names = self.in_bbox(*bbox)["Location"]
+		return df["Location"].astype(str).isin(names).to_numpy()
+
+	def distance_from_source(self, locations: pd.Series) -> np.ndarray:
+		"""Distance in km from the source for each station name (NaN for stations without coordinates)."""
+		return self._distance.reindex(locations.astype(str).to_numpy()).to_numpy()
+
+def distance_view(rows: pd.DataFrame, isotope: str, index: StationIndex) -> pd.DataFrame:
+	"""
+	Measurement rows as (Date, Location, distance_km, Value) for a concentration-vs-distance plot,
+	dropping rows without a reading or without station coordinates.
+	"""
+	out = pd.DataFrame({
+		"Date": rows["Date"].to_numpy(),
+		"Location": rows["Location"].astype(str).to_numpy(),
+		"distance_km": index.distance_from_source(rows["Location"]),
+		"Value": rows[isotope].to_numpy(dtype=np.float64, na_value=np.nan),
+	})
+	return out.dropna(subset=["distance_km", "Value"]).reset_index(drop=True)
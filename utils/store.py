@@ -0,0 +1,144 @@
+"""
+Persistent columnar cache of the cleaned tables.
+
+The tables produced by prep.make_tables are written as uncompressed Feather (Arrow IPC) files in a
+`<csv name>.cache/` folder next to the source CSV. A manifest records the CSV content hash and the
+pipeline version; the cache is rebuilt only when one of those changes, otherwise a cold start is a
+memory-mapped load instead of a CSV parse.
+
+Each generation (one key) is written to its own `gen-<key digest>/` subfolder and the manifest is
+switched to it last. Tables are read lazily, so a LazyTables keeps reading the files of the
+generation it was opened on: a rebuild never mixes old and new tables in one session. The previous
+generation is kept for the sessions still reading it (KEEP_GENERATIONS), older ones are removed.
+"""
+import hashlib
+import json
+import os
+import shutil
+from functools import lru_cache, partial
+from pathlib import Path
+from typing import Callable, Mapping, Optional
+
+import pandas as pd
+from pyarrow import feather
+
+from .tables import LazyTables
+
+CACHED_TABLES = ("clean", "timeseries", "by_region")
+MANIFEST_NAME = "manifest.json"
+GENERATION_PREFIX = "gen-"
+# generations left on disk after a write: the current one and the one before it
+KEEP_GENERATIONS = 2
+
+@lru_cache(maxsize=16)
+def _hash_file(path: Path, size: int, mtime_ns: int, chunk_size: int) -> str:
+	digest = hashlib.sha256()
+	with open(path, "rb") as f:
+		for block in iter(lambda: f.read(chunk_size), b""):
+			digest.update(block)
+	return digest.hexdigest()
+
+def file_hash(path: Path, chunk_size: int = 1 << 20) -> str:
+	"""
+	Return the sha256 hex digest of a file, read in 1 MB blocks.
+	The digest is memoized per (path, size, mtime) so repeated calls on an unchanged file are free.
+	"""
+	stat = os.stat(path)
+	return _hash_file(Path(path), stat.st_size, stat.st_mtime_ns, chunk_size)
+
+def safe_name(value) -> str:
+	"""`value` as a file name: characters other than letters, digits, '-', '_' and '.' become '_'."""
+	return "".join(c if c.isalnum() or c in "-_." else "_" for c in str(value)).strip("._") or "unnamed"
+
+def cache_dir(path: Path) -> Path:
+	"""Return the cache folder used for a given source CSV."""
+	path = Path(path)
+	return path.parent / f"{path.stem}.cache"
+
+def cache_key(path: Path, version: str) -> dict:
+	"""Key identifying a cache generation: source content hash + pipeline version."""
+	return {"sha256": file_hash(path), "pipeline": str(version)}
+
+def generation_name(key: dict) -> str:
+	"""Subfolder of the cache folder holding the tables of `key`."""
+	digest = hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+	return f"{GENERATION_PREFIX}{digest[:16]}"
+
+def read_tables(path: Path, key: dict) -> Optional[LazyTables]:
+	"""
+	Return the cached tables for `path` if the stored manifest matches `key`, else None.
+	Each file is memory-mapped when its table is first read, tables nobody reads are never loaded.
+	"""
+	folder = cache_dir(path)
+	manifest_path = folder / MANIFEST_NAME
+	if not manifest_path.exists():
+		return None
+	try:
+		manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+	except (OSError, ValueError):
+		return None
+	if manifest.get("key") != key or not manifest.get("generation"):
+		return None
+	generation = folder / manifest["generation"]
+	loaders = {}
+	for name in manifest.get("tables", []):
+		table_path = generation / f"{name}.feather"
+		if not table_path.exists():
+			return None
+		loaders[name] = ((), partial(feather.read_feather, table_path, memory_map=True))
+	return LazyTables(loaders)
+
+def write_tables(path: Path, key: dict, tables: Mapping[str, pd.DataFrame], names=CACHED_TABLES) -> None:
+	"""
+	Write `tables[names]` to a new generation subfolder of the cache folder of `path`.
+	Each file goes through a temp name + rename, and the manifest is switched to the generation last,
+	so readers never see a half-written generation nor one mixed with another.
+	"""
+	folder = cache_dir(path)
+	generation = generation_name(key)
+	target = folder / generation
+	target.mkdir(parents=True, exist_ok=True)
+	written = []
+	for name in names:
+		if name not in tables:
+			continue
+		dest = target / f"{name}.feather"
+		tmp = dest.with_suffix(f".feather.{os.getpid()}.tmp")
+		feather.write_feather(tables[name], tmp, compression="uncompressed")
+		os.replace(tmp, dest)
+		written.append(name)
+	manifest_path = folder / MANIFEST_NAME
+	tmp = manifest_path.with_suffix(f".json.{os.getpid()}.tmp")
+	tmp.write_text(json.dumps({"key": key, "generation": generation, "tables": written}, indent=2), encoding="utf-8")
+	os.replace(tmp, manifest_path)
+	_remove_old_generations(folder, generation)
+
+def _remove_old_generations(folder: Path, current: str, keep: int = KEEP_GENERATIONS) -> None:
+	"""Delete the generation subfolders beyond the `keep` most recent ones (`current` included)."""
+	others = [p for p in folder.glob(f"{GENERATION_PREFIX}*") if p.is_dir() and p.name != current]
+	others.sort(key=lambda p: p.stat().st_mtime_ns, reverse=True)
+	for old in others[max(keep - 1, 0):]:
+		shutil.rmtree(old, ignore_errors=True)
+	# tables of the former layout, written straight into the cache folder
+	for name in CACHED_TABLES:
+		(folder / f"{name}.feather").unlink(missing_ok=True)
+
+def load_or_build(path: Path, build: Callable[[], Mapping[str, pd.DataFrame]], version: str,
+		key: Optional[dict] = None) -> LazyTables:
+	"""
+	Return the cached tables for `path`, calling `build()` and refreshing the cache on a miss.
+	`key` replaces cache_key(path, version) for tables that do not come from the file at `path`.
+	Only CACHED_TABLES are returned, so hits and misses expose the same tables.
+	A cache that cannot be written (read-only disk, ...) only costs the rebuild on the next start.
+	"""
+	key = cache_key(path, version) if key is None else key
+	tables = read_tables(path, key)
+	if tables is not None:
+		return tables
+	built = build()
+	tables = {name: built[name] for name in CACHED_TABLES if name in built}
+	try:
+		write_tables(path, key, tables)
+	except OSError as e:
+		print(f"Could not write table cache for {path}: {e}")
+	return LazyTables.from_frames(tables)
@@ -0,0 +1,259 @@
+"""
+Interpolated contamination surfaces: inverse-distance weighting (IDW) of the daily station means on a
+regular latitude/longitude grid, for every (isotope, day).
+
+A scatter map leaves the gaps between stations empty. A surface fills them from nearby stations
+only; cells farther than `max_km` from every station stay transparent. The weights matrix
+(grid cells × stations) depends only on the station positions, so all the days of one isotope are
+two matrix products: (values · Wᵀ) / (measured · Wᵀ). The grid is processed in bands of rows, each
+against the stations close enough in latitude to reach it, which bounds the weights in memory.
+
+Surfaces are precomputed in batch (`make surfaces`, i.e. `python -m utils.surface`). They are stored
+as one float32 .npy array of shape (isotopes, days, rows, cols) in the table cache folder, next to
+the Feather tables (see utils/store.py). The dashboard memory-maps it and never interpolates during
+a rerun.
+"""
+import argparse
+import base64
+import datetime as dt
+import io
+import json
+import os
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+from . import store
+from .prefix import StationPrefixSums
+from .spatial import EARTH_RADIUS_KM, haversine_km, valid_coords
+
+SURFACE_VERSION = "1"
+ARRAY_NAME = "surfaces.npy"
+META_NAME = "surfaces.json"
+# grid cell size (degrees), IDW power, influence radius (km), padding around the stations (degrees)
+STEP = 0.25
+POWER = 2.0
+MAX_KM = 400.0
+PAD_DEG = 2.0
+# grid cells per band (weights of one band: cells × nearby stations)
+BAND_CELLS = 4096
+# color ramp of the rendered image, low → high (log scale)
+RAMP = np.array([[255, 255, 178], [254, 204, 92], [253, 141, 60], [240, 59, 32], [189, 0, 38]], dtype=np.float64)
+ALPHA = 170
+
+def grid_bounds(lat, lon, step: float = STEP, pad: float = PAD_DEG) -> Tuple[float, float, float, float]:
+	"""(min_lon, min_lat, max_lon, max_lat) around the stations, padded and snapped to `step`."""
+	snap = lambda v, f: float(f(v / step) * step)
+	return (snap(np.min(lon) - pad, np.floor), snap(max(np.min(lat) - pad, -90.0), np.floor),
+		snap(np.max(lon) + pad, np.ceil), snap(min(np.max(lat) + pad, 90.0), np.ceil))
+
+def grid_centers(bounds, step: float = STEP) -> Tuple[np.ndarray, np.ndarray]:
+	"""Cell-center latitudes (north → south, image row order) and longitudes (west → east)."""
+	min_lon, min_lat, max_lon, max_lat = bounds
+	n_rows, n_cols = int(round((max_lat - min_lat) / step)), int(round((max_lon - min_lon) / step))
+	return max_lat - step * (np.arange(n_rows) + 0.5), min_lon + step * (np.arange(n_cols) + 0.5)
+
+def idw_weights(cell_lat, cell_lon, station_lat, station_lon, power: float = POWER, max_km: float = MAX_KM) -> np.ndarray:
+	"""(cells × stations) float32 weights 1 / distance^power (distance floored at 1 km), 0 beyond max_km."""
+	dist = haversine_km(np.asarray(cell_lat)[:, None], np.asarray(cell_lon)[:, None],
+		np.asarray(station_lat)[None, :], np.asarray(station_lon)[None, :])
+	weights = np.maximum(dist, 1.0) ** -power
+	weights[dist > max_km] = 0.0
+	return weights.astype(np.float32)
+
+def interpolate(values: np.ndarray, weights: np.ndarray) -> np.ndarray:
+	"""
+	IDW of a batch of station readings: `values` (batch × stations, NaN = not measured) → (batch × cells).
+	Cells with no measured station within reach are NaN.
+	"""
+	measured = ~np.isnan(values)
+	num = np.where(measured, values, 0.0).astype(np.float32) @ weights.T
+	den = measured.astype(np.float32) @ weights.T
+	with np.errstate(invalid="ignore", divide="ignore"):
+		out = num / den
+	out[den <= 0] = np.nan
+	return out
+
+def daily_station_means(engine: StationPrefixSums) -> np.ndarray:
+	"""(value columns, days, stations) daily means from the prefix sums, NaN where a station has no reading."""
+	sums = np.diff(engine.sums, axis=0)
+	counts = np.diff(engine.counts, axis=0)
+	with np.errstate(invalid="ignore", divide="ignore"):
+		means = sums / counts
+	return np.moveaxis(means, 2, 0)
+
+class Surfaces:
+	"""
+	`data[k, d]`: the (rows × cols) surface of `value_cols[k]` on `days[d]` (float32, NaN = no estimate),
+	usually memory-mapped from the cache; `bounds` is the (min_lon, min_lat, max_lon, max_lat) of the grid.
+	"""
+
+	def __init__(self, data: np.ndarray, meta: dict):
+		self.data = data
+		self.meta = meta
+		self.days = np.array(meta["days"], dtype="datetime64[D]")
+		self.value_cols = list(meta["value_cols"])
+		self.bounds = tuple(meta["bounds"])
+
+	def mean(self, value_col: str, start: dt.date, end: dt.date) -> Optional[np.ndarray]:
+		"""Cell-wise mean of the daily surfaces in [start, end] (None without days or for an unknown column)."""
+		if value_col not in self.value_cols:
+			return None
+		i = int(np.searchsorted(self.days, np.datetime64(start, "D"), side="left"))
+		j = int(np.searchsorted(self.days, np.datetime64(end, "D"), side="right"))
+		if j <= i:
+			return None
+		block = self.data[self.value_cols.index(value_col), i:j]
+		if j - i == 1:
+			return np.asarray(block[0])
+		measured = ~np.isnan(block)
+		total = np.where(measured, block, 0.0).sum(axis=0)
+		count = measured.sum(axis=0)
+		with np.errstate(invalid="ignore", divide="ignore"):
+			return np.where(count > 0, total / count, np.nan).astype(np.float32)
+
+def _mercator_y(lat):
+	return np.log(np.tan(np.pi / 4 + np.radians(lat) / 2))
+
+def mercator_rows(grid: np.ndarray, bounds) -> np.ndarray:
+	"""
+	Rows of `grid` (evenly spaced latitudes, north → south) resampled to rows evenly spaced in
+	Web Mercator, since deck.gl stretches a BitmapLayer image linearly between its bounds.
+	"""
+	min_lon, min_lat, max_lon, max_lat = bounds
+	n_rows = grid.shape[0]
+	y = np.linspace(_mercator_y(max_lat), _mercator_y(min_lat), n_rows + 1)
+	y = (y[:-1] + y[1:]) / 2
+	lat = np.degrees(2 * np.arctan(np.exp(y)) - np.pi / 2)
+	# nearest source row: centers at max_lat - step * (row + 0.5)
+	step = (max_lat - min_lat) / n_rows
+	rows = np.clip(np.floor((max_lat - lat) / step).astype(np.int64), 0, n_rows - 1)
+	return grid[rows]
+
+def to_image(grid: np.ndarray, bounds) -> str:
+	"""
+	PNG data URL of a surface (log color ramp, transparent where NaN) for a deck.gl BitmapLayer
+	spanning `bounds` (rows resampled to Web Mercator, see mercator_rows).
+	"""
+	from PIL import Image
+	grid = mercator_rows(grid, bounds)
+	finite = np.isfinite(grid)
+	rgba = np.zeros(grid.shape + (4,), dtype=np.uint8)
+	if finite.any():
+		scaled = np.log1p(np.clip(grid[finite], 0.0, None))
+		top = scaled.max()
+		t = scaled / top if top > 0 else np.zeros_like(scaled)
+		pos = t * (len(RAMP) - 1)
+		lo = np.minimum(pos.astype(np.int64), len(RAMP) - 2)
+		frac = (pos - lo)[:, None]
+		rgba[finite, :3] = np.round(RAMP[lo] * (1 - frac) + RAMP[lo + 1] * frac).astype(np.uint8)
+		rgba[finite, 3] = ALPHA
+	buffer = io.BytesIO()
+	Image.fromarray(rgba, mode="RGBA").save(buffer, format="PNG", optimize=True)
+	return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+def surface_key(tables_key: dict) -> dict:
+	"""Key of a surface generation: the key of the table cache (see io.table_cache) + SURFACE_VERSION."""
+	return {"tables": tables_key, "surface": SURFACE_VERSION}
+
+def write_surfaces(path: Path, key: dict, engine: StationPrefixSums, step: float = STEP, power: float = POWER,
+		max_km: float = MAX_KM, band_cells: int = BAND_CELLS) -> Path:
+	"""
+	Interpolate every (value column, day) of `engine` and write them to the cache folder of `path`.
+	Bands are written straight into the memory-mapped .npy (never the whole stack in memory); the
+	array goes through a temp name + rename and the metadata is written last, as in store.write_tables.
+	"""
+	keep = valid_coords(engine.latitude, engine.longitude)
+	lat, lon = engine.latitude[keep], engine.longitude[keep]
+	if not keep.any():
+		raise ValueError("No station with valid coordinates to interpolate from")
+	bounds = grid_bounds(lat, lon, step)
+	cell_lat, cell_lon = grid_centers(bounds, step)
+	means = daily_station_means(engine)[:, :, keep].astype(np.float32)
+	n_values, n_days = means.shape[:2]
+	band_rows = max(1, band_cells // len(cell_lon))
+	# a station farther in latitude than this from a band cannot reach it
+	reach_deg = np.degrees(max_km / EARTH_RADIUS_KM)
+
+	folder = store.cache_dir(path)
+	folder.mkdir(exist_ok=True)
+	dest = folder / ARRAY_NAME
+	tmp = dest.with_suffix(f".npy.{os.getpid()}.tmp")
+	out = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32,
+		shape=(n_values, n_days, len(cell_lat), len(cell_lon)))
+	for r in range(0, len(cell_lat), band_rows):
+		band_lat = cell_lat[r:r + band_rows]
+		near = np.flatnonzero((lat >= band_lat.min() - reach_deg) & (lat <= band_lat.max() + reach_deg))
+		if len(near) == 0:
+			out[:, :, r:r + band_rows] = np.nan
+			continue
+		grid_lat, grid_lon = np.meshgrid(band_lat, cell_lon, indexing="ij")
+		weights = idw_weights(grid_lat.ravel(), grid_lon.ravel(), lat[near], lon[near], power, max_km)
+		for k in range(n_values):
+			out[k, :, r:r + band_rows] = interpolate(means[k][:, near], weights).reshape(n_days, len(band_lat), len(cell_lon))
+	out.flush()
+	del out
+	os.replace(tmp, dest)
+	meta = {
+		"key": key,
+		"days": [str(d) for d in engine.index.days],
+		"value_cols": list(engine.value_cols),
+		"bounds": list(bounds),
+		"step": step,
+		"power": power,
+		"max_km": max_km,
+		"stations": int(keep.sum()),
+	}
+	meta_path = folder / META_NAME
+	tmp = meta_path.with_suffix(f".json.{os.getpid()}.tmp")
+	tmp.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+	os.replace(tmp, meta_path)
+	return dest
+
+def read_surfaces(path: Path, key: dict) -> Optional[Surfaces]:
+	"""The precomputed surfaces for `path` (memory-mapped) if their metadata matches `key`, else None."""
+	folder = store.cache_dir(path)
+	try:
+		meta = json.loads((folder / META_NAME).read_text(encoding="utf-8"))
+	except (OSError, ValueError):
+		return None
+	if meta.get("key") != key:
+		return None
+	try:
+		data = np.load(folder / ARRAY_NAME, mmap_mode="r")
+	except (OSError, ValueError):
+		return None
+	return Surfaces(data, meta)
+
+def load_surfaces() -> Optional[Surfaces]:
+	"""Surfaces of the current dataset, None until `make surfaces` has run for it."""
+	from .io import table_cache
+	path, tables_key = table_cache()
+	return read_surfaces(path, surface_key(tables_key))
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Precompute the interpolated (IDW) surfaces of the dashboard map.")
+	parser.add_argument("--step", type=float, default=STEP, help="grid cell size in degrees")
+	parser.add_argument("--power", type=float, default=POWER, help="IDW distance power")
+	parser.add_argument("--max-km", type=float, default=MAX_KM, help="influence radius of a station in km")
+	parser.add_argument("--force", action="store_true", help="rebuild even if the surfaces are up to date")
+	args = parser.parse_args(argv)
+
+	from .index import DateIndex
+	from .io import load_tables, table_cache
+	path, tables_key = table_cache()
+	key = surface_key(tables_key)
+	current = read_surfaces(path, key)
+	params = {"step": args.step, "power": args.power, "max_km": args.max_km}
+	if current is not None and not args.force and all(current.meta.get(k) == v for k, v in params.items()):
+		print(f"Surfaces up to date in {store.cache_dir(path)}")
+		return
+	engine = StationPrefixSums(DateIndex(load_tables()["clean"]))
+	dest = write_surfaces(path, key, engine, **params)
+	surfaces = read_surfaces(path, key)
+	shape = " × ".join(str(n) for n in surfaces.data.shape)
+	print(f"Surfaces ({shape}, {dest.stat().st_size / 1e6:.1f} MB) written to {dest}")
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,78 @@
+"""
+Lazy mapping of derived tables.
+
+Each table is declared with the tables it is computed from and a builder taking those tables as
+arguments. Nothing is computed until a table is first read; it is then memoized, so only the tables
+(and dependencies) that a page actually reads are ever built or loaded. Instances are shared across
+sessions (st.cache_resource), so building is serialized by a lock and the tables must not be
+modified in place.
+"""
+import threading
+from collections.abc import Mapping
+from typing import Callable, Dict, Iterator, Tuple
+
+import pandas as pd
+
+# name -> (names of the tables it is computed from, builder called with those tables)
+Builders = Dict[str, Tuple[Tuple[str, ...], Callable[..., pd.DataFrame]]]
+
+class LazyTables(Mapping):
+	"""Read-only mapping of table name → DataFrame, each built on first access from its dependencies."""
+
+	def __init__(self, builders: Builders, frames: Mapping = None):
+		self._builders = dict(builders)
+		self._frames = dict(frames or {})
+		for name in self._frames:
+			self._builders.setdefault(name, ((), None))
+		self._lock = threading.RLock()
+		self._building = set()
+
+	@classmethod
+	def from_frames(cls, frames: Mapping) -> "LazyTables":
+		"""Mapping over tables that already exist."""
+		return cls({}, frames)
+
+	def __getitem__(self, name: str) -> pd.DataFrame:
+		frame = self._frames.get(name)
+		if frame is not None:
+			return frame
+		if name not in self._builders:
+			raise KeyError(name)
+		with self._lock:
+			if name in self._frames:
+				return self._frames[name]
+			if name in self._building:
+				raise RuntimeError(f"Circular table dependency through {name!r}")
+			self._building.add(name)
+			try:
+				deps, build = self._builders[name]
+				frame = build(*(self[dep] for dep in deps))
+			finally:
+				self._building.discard(name)
+			self._frames[name] = frame
+			return frame
+
+	def __iter__(self) -> Iterator[str]:
+		return iter(self._builders)
+
+	def __len__(self) -> int:
+		return len(self._builders)
+
+	def __repr__(self) -> str:
+		return f"LazyTables(built={sorted(self._frames)}, pending={sorted(set(self._builders) - set(self._frames))})"
+
+	def is_built(self, name: str) -> bool:
+		return name in self._frames
+
+	def built(self) -> Dict[str, pd.DataFrame]:
+		"""The tables materialized so far (iterating items() would build every table)."""
+		return dict(self._frames)
+
+	def dependencies(self, name: str) -> Tuple[str, ...]:
+		return self._builders[name][0]
+
+	def derive(self, builders: Builders) -> "LazyTables":
+		"""New mapping adding `builders` on top of these tables (which stay lazy and shared)."""
+		inherited = {name: ((), lambda name=name: self[name]) for name in self._builders}
+		ready = {name: frame for name, frame in self._frames.items() if name not in builders}
+		return LazyTables({**inherited, **builders}, ready)
@@ -0,0 +1,168 @@
+"""
+Lightweight tracing spans for the dashboard reruns.
+
+A span records the wall time of a block, the rows going in and out, the change in resident memory
+(RSS from /proc/self/statm, None where unavailable) and, for st.cache_data functions, whether the
+call was a cache hit or a miss. Spans of the current rerun are kept per script thread for the
+diagnostics panel, and every finished span is logged as one JSON line on the `chernobyl.trace`
+logger; set TRACE_LOG=<path> to append them to a file.
+
+	trace.start_run()
+	with trace.span("date_filter", rows_in=len(df)) as s:
+		df_map = ...
+		s.rows_out = len(df_map)
+
+	@trace.traced("get_data", cached=True)
+	@st.cache_data
+	def get_data(fingerprint):
+		trace.cache_miss()    # the body only runs on a miss
+		...
+"""
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections.abc import Mapping
+from contextlib import contextmanager
+from typing import Optional
+
+import pandas as pd
+
+logger = logging.getLogger("chernobyl.trace")
+
+_state = threading.local()
+
+try:
+	_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+	_PAGE_SIZE = 4096
+
+def _rss_bytes() -> Optional[int]:
+	"""Resident set size of this process, None when /proc is not available."""
+	try:
+		with open("/proc/self/statm", "rb") as f:
+			return int(f.read().split()[1]) * _PAGE_SIZE
+	except (OSError, ValueError, IndexError):
+		return None
+
+def _configure_logger() -> None:
+	path = os.environ.get("TRACE_LOG")
+	if path and not any(getattr(h, "_trace_log", False) for h in logger.handlers):
+		handler = logging.FileHandler(path, encoding="utf-8")
+		handler.setFormatter(logging.Formatter("%(message)s"))
+		handler._trace_log = True
+		logger.addHandler(handler)
+		logger.setLevel(logging.INFO)
+
+_configure_logger()
+
+def rows_of(obj) -> Optional[int]:
+	"""Row count of a frame/series, of the frames in a mapping (summed, built tables only for LazyTables), else None."""
+	if isinstance(obj, (pd.DataFrame, pd.Series)):
+		return len(obj)
+	if isinstance(obj, Mapping):
+		values = obj.built().values() if hasattr(obj, "built") else obj.values()
+		counts = [len(v) for v in values if isinstance(v, (pd.DataFrame, pd.Series))]
+		return sum(counts) if counts else None
+	return None
+
+class Span:
+	"""One timed block. `rows_in`, `rows_out` and `cache` may be set while the block runs."""
+
+	def __init__(self, name: str, rows_in: Optional[int] = None, cached: bool = False, parent: Optional[str] = None, depth: int = 0):
+		self.name = name
+		self.rows_in = rows_in
+		self.rows_out = None
+		self.cached = cached
+		self.cache = None
+		self.parent = parent
+		self.depth = depth
+		self.ms = None
+		self.rss_delta_mb = None
+
+	def record(self) -> dict:
+		return {
+			"name": self.name,
+			"parent": self.parent,
+			"depth": self.depth,
+			"ms": self.ms,
+			"rows_in": self.rows_in,
+			"rows_out": self.rows_out,
+			"rss_delta_mb": self.rss_delta_mb,
+			"cache": self.cache,
+		}
+
+def _stack() -> list:
+	if not hasattr(_state, "stack"):
+		_state.stack, _state.spans, _state.run = [], [], uuid.uuid4().hex[:12]
+	return _state.stack
+
+def start_run() -> str:
+	"""Forget the spans of the previous rerun in this thread; returns the new run id."""
+	_stack()
+	_state.stack, _state.spans, _state.run = [], [], uuid.uuid4().hex[:12]
+	return _state.run
+
+def spans() -> list:
+	"""Records of the spans finished since start_run(), in completion order."""
+	_stack()
+	return list(_state.spans)
+
+def spans_frame() -> pd.DataFrame:
+	"""spans() in start order as a DataFrame, names indented by nesting depth (diagnostics panel)."""
+	records = spans()
+	columns = ["stage", "ms", "rows_in", "rows_out", "rss_delta_mb", "cache"]
+	if not records:
+		return pd.DataFrame(columns=columns)
+	df = pd.DataFrame(sorted(records, key=lambda r: r["start"]))
+	df["stage"] = [" " * d + n for d, n in zip(df["depth"], df["name"])]
+	return df[columns]
+
+def cache_miss() -> None:
+	"""Mark the innermost open span as a cache miss (call it first thing in a cached function body)."""
+	stack = _stack()
+	if stack:
+		stack[-1].cache = "miss"
+
+@contextmanager
+def span(name: str, rows_in: Optional[int] = None, cached: bool = False):
+	"""Time the enclosed block as a span named `name` (see the module docstring)."""
+	stack = _stack()
+	s = Span(name, rows_in, cached, stack[-1].name if stack else None, len(stack))
+	stack.append(s)
+	rss_before = _rss_bytes()
+	start_wall = time.time()
+	start = time.perf_counter()
+	try:
+		yield s
+	finally:
+		s.ms = round((time.perf_counter() - start) * 1000.0, 3)
+		rss_after = _rss_bytes()
+		if rss_before is not None and rss_after is not None:
+			s.rss_delta_mb = round((rss_after - rss_before) / 1e6, 3)
+		if s.cached and s.cache is None:
+			s.cache = "hit"
+		stack.pop()
+		record = dict(s.record(), start=start_wall, run=_state.run)
+		_state.spans.append(record)
+		if logger.isEnabledFor(logging.INFO):
+			logger.info(json.dumps(record, default=str))
+
+def traced(name: str, cached: bool = False):
+	"""
+	Decorator running each call in a span: rows_in from the first DataFrame argument, rows_out
+	from the result (see rows_of). Put it above @st.cache_data with cached=True to record hits.
+	"""
+	def decorate(fn):
+		@functools.wraps(fn)
+		def wrapper(*args, **kwargs):
+			rows_in = next((len(a) for a in args if isinstance(a, pd.DataFrame)), None)
+			with span(name, rows_in, cached) as s:
+				result = fn(*args, **kwargs)
+				s.rows_out = rows_of(result)
+			return result
+		return wrapper
+	return decorate
@@ -1,38 +1,87 @@
+from typing import TYPE_CHECKING, Optional
+import numpy as np
 import pandas as pd
-import altair as alt
-import pydeck as pdk
+from .decay import isotope_label
+from .downsample import downsample
 
-def build_line_chart(df_time: pd.DataFrame) -> alt.Chart:
-	"""Return an Altair line chart for the timeseries dataframe."""
+# altair and pydeck are imported by the functions that draw, so pages without charts never load them
+if TYPE_CHECKING:
+	import altair as alt
+	import pydeck as pdk
+
+def build_line_chart(df_time: pd.DataFrame, max_points: Optional[int] = None) -> "alt.Chart":
+	"""
+	Return an Altair line chart for the timeseries dataframe.
+	max_points: if set, each isotope is reduced to about that many points (min/max buckets) first.
+	"""
+	import altair as alt
+	if max_points is not None:
+		df_time = downsample(df_time, max_points, method="minmax")
 	return alt.Chart(df_time).mark_line().encode(
 		x="Date:T",
 		y="Concentration:Q",
 		color="Isotope:N"
 	).properties(height=300)
 
-def build_half_life_chart() -> alt.Chart:
-	"""Return an Altair bar chart displaying isotopes half-lives."""
+def build_half_life_chart(fitted: Optional[pd.DataFrame] = None) -> "alt.Chart":
+	"""
+	Return an Altair bar chart displaying isotopes half-lives.
+	fitted: optional decay.fit_decay() output (one row per isotope); its apparent half-lives are drawn
+	next to the theoretical ones, on a log scale.
+	"""
+	import altair as alt
 	half_life = pd.DataFrame({
 		"Isotope": ["I-131", "Cs-134", "Cs-137"],
 		"Half-life (days)": [8, 754, 11000]
 	})
-	return alt.Chart(half_life).mark_bar().encode(
-		x="Isotope",
-		y="Half-life (days)",
-		color="Isotope"
+	if fitted is None or fitted["half_life_days"].isna().all():
+		return alt.Chart(half_life).mark_bar().encode(
+			x="Isotope",
+			y="Half-life (days)",
+			color="Isotope"
+		)
+	observed = pd.DataFrame({
+		"Isotope": fitted["Isotope"].map(isotope_label),
+		"Half-life (days)": fitted["half_life_days"],
+		"Source": "Fitted (post-peak data)",
+	}).dropna()
+	both = pd.concat([half_life.assign(Source="Theoretical"), observed], ignore_index=True)
+	return alt.Chart(both).mark_bar().encode(
+		x=alt.X("Isotope:N", sort=half_life["Isotope"].tolist()),
+		xOffset="Source:N",
+		y=alt.Y("Half-life (days):Q", scale=alt.Scale(type="log")),
+		color="Source:N",
+		tooltip=["Isotope", "Source", alt.Tooltip("Half-life (days):Q", format=".1f")]
 	)
 
+def build_distance_chart(df_distance: pd.DataFrame, selected_isotope: str) -> "alt.Chart":
+	"""
+	Return an Altair scatter of concentration against distance from the plant, one point per reading,
+	colored by date. df_distance: spatial.distance_view() output (Date / Location / distance_km / Value).
+	"""
+	import altair as alt
+	return alt.Chart(df_distance).mark_circle(size=40, opacity=0.7).encode(
+		x=alt.X("distance_km:Q", title="Distance from Chernobyl (km)"),
+		y=alt.Y("Value:Q", title=f"{isotope_label(selected_isotope)} (Bq/m³)", scale=alt.Scale(type="symlog")),
+		color=alt.Color("Date:T", scale=alt.Scale(scheme="viridis")),
+		tooltip=["Location", alt.Tooltip("Date:T", format="%Y-%m-%d"),
+			alt.Tooltip("distance_km:Q", format=".0f"), alt.Tooltip("Value:Q", format=".3f")]
+	).properties(height=300)
+
 def prepare_map_data(df_map: pd.DataFrame, selected_isotope: str, scale: float = 5000.0) -> pd.DataFrame:
 	"""
 	Coerce map columns, filter invalid rows and compute a numeric 'radius' column.
+	df_map holds measurement rows or per-station aggregates (no 'Date' column, optional 'Count').
 	Returns df_filtered (subset ready to send to pydeck).
 	"""
-	df_map_plot = df_map[["Latitude", "Longitude", "Location", selected_isotope, "Date"]].copy()
+	extra = [col for col in ("Date", "Count") if col in df_map.columns]
+	df_map_plot = df_map[["Latitude", "Longitude", "Location", selected_isotope] + extra].copy()
 	df_map_plot = df_map_plot.rename(columns={selected_isotope: "Value"})
 	# Coerce types safely
 	df_map_plot["Latitude"] = pd.to_numeric(df_map_plot["Latitude"], errors="coerce")
 	df_map_plot["Longitude"] = pd.to_numeric(df_map_plot["Longitude"], errors="coerce")
-	df_map_plot["Value"] = pd.to_numeric(df_map_plot["Value"].astype(str).str.replace(",", "."), errors="coerce")
+	if not pd.api.types.is_numeric_dtype(df_map_plot["Value"]):
+		df_map_plot["Value"] = pd.to_numeric(df_map_plot["Value"].astype(str).str.replace(",", "."), errors="coerce")
 	# Filter invalid coords/values
 	df_map_plot = df_map_plot.dropna(subset=["Latitude", "Longitude", "Value"])
 	df_map_plot = df_map_plot[
@@ -44,8 +93,44 @@ def prepare_map_data(df_map: pd.DataFrame, selected_isotope: str, scale: float =
 	df_map_plot["radius"] = (df_map_plot["Value"].astype(float) + 1e-12) * scale
 	return df_map_plot
 
-def build_deck(df_filtered: pd.DataFrame, selected_isotope: str, default_center=(51.0, 30.0), zoom: int = 5) -> pdk.Deck:
-	"""Build and return a pydeck.Deck object from prepared df_filtered."""
+# Above this many points the map is drawn from server-side aggregated grid cells
+LOD_POINT_THRESHOLD = 2000
+
+def cell_size_for_zoom(zoom: int, cell_px: int = 32) -> float:
+	"""Grid cell size in degrees covering about `cell_px` screen pixels at web-mercator `zoom`."""
+	return cell_px * 360.0 / (256 * 2 ** zoom)
+
+def aggregate_cells(df_filtered: pd.DataFrame, cell_deg: float) -> pd.DataFrame:
+	"""
+	Bin prepared map points into a lat/lon grid of `cell_deg` degrees.
+	Each cell carries the sum ('Value'), 'Max' and 'Count' of its points, sits at their centroid and
+	takes the radius of its largest point; 'Location' is a label for the tooltip.
+	"""
+	if df_filtered.empty:
+		return df_filtered.assign(Max=pd.Series(dtype=float), Count=pd.Series(dtype=int))[
+			["Latitude", "Longitude", "Location", "Value", "Max", "Count", "radius"]]
+	lat_cell = np.floor(df_filtered["Latitude"].to_numpy() / cell_deg).astype(np.int64)
+	lon_cell = np.floor(df_filtered["Longitude"].to_numpy() / cell_deg).astype(np.int64)
+	cells = df_filtered.groupby([lat_cell, lon_cell], sort=False).agg(
+		Latitude=("Latitude", "mean"),
+		Longitude=("Longitude", "mean"),
+		Value=("Value", "sum"),
+		Max=("Value", "max"),
+		Count=("Value", "size"),
+		radius=("radius", "max"),
+	).reset_index(drop=True)
+	cells.insert(2, "Location", cells["Count"].astype(str) + np.where(cells["Count"] > 1, " points", " point"))
+	return cells
+
+def build_deck(df_filtered: pd.DataFrame, selected_isotope: str, default_center=(51.0, 30.0), zoom: int = 5,
+		cells: Optional[pd.DataFrame] = None, surface: Optional[dict] = None) -> "pdk.Deck":
+	"""
+	Build and return a pydeck.Deck object from prepared df_filtered.
+	cells: optional aggregate_cells() output; when given it is drawn instead of the individual points.
+	surface: optional {"image": PNG data URL, "bounds": (min_lon, min_lat, max_lon, max_lat)} of an
+	interpolated surface (see utils/surface.py), drawn as a BitmapLayer under the points.
+	"""
+	import pydeck as pdk
 	color_map = {
 		"I_131_(Bq/m3)": [255, 0, 0],
 		"Cs_134_(Bq/m3)": [0, 255, 0],
@@ -53,12 +138,19 @@ def build_deck(df_filtered: pd.DataFrame, selected_isotope: str, default_center=
 	}
 	layer = pdk.Layer(
 		"ScatterplotLayer",
-		data=df_filtered,
+		data=df_filtered if cells is None else cells,
 		get_position=["Longitude", "Latitude"],
 		get_radius="radius",
 		get_fill_color=color_map.get(selected_isotope, [0, 0, 0]),
 		pickable=True
 	)
+	layers = [layer]
+	if surface is not None:
+		layers.insert(0, pdk.Layer("BitmapLayer", data=None, image=surface["image"], bounds=list(surface["bounds"])))
+	if cells is None:
+		tooltip = {"text": "Location: {Location}\nValue: {Value}"}
+	else:
+		tooltip = {"text": "Cell: {Location}\nSum: {Value}\nMax: {Max}"}
 	# compute center robustly
 	center_lat, center_lon = None, None
 	if not df_filtered.empty:
@@ -69,4 +161,4 @@ def build_deck(df_filtered: pd.DataFrame, selected_isotope: str, default_center=
 	if center_lat is None:
 		center_lat, center_lon = default_center
 	view_state = pdk.ViewState(latitude=center_lat, longitude=center_lon, zoom=zoom, pitch=0)
-	return pdk.Deck(layers=[layer], initial_view_state=view_state, tooltip={"text": "Location: {Location}\nValue: {Value}"})
+	return pdk.Deck(layers=layers, initial_view_state=view_state, tooltip=tooltip)